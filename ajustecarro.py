@@ -0,0 +1,172 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+
+import juegocarro as carro
+
+CACHE_PATH = os.path.join(carro.CACHE_DIR, 'ajustecarro.json')
+CACHE_VERSION = 3  # subirlo si cambia la simulación o la forma de puntuar
+
+# Rejilla por defecto: 4 x 2 x 3 x 3 = 72 configuraciones. derivative_factor solo
+# escala el término de Kd, así que se barre Kd directamente
+DEFAULT_GRID = {
+    'Kp': [1.5, 3, 4.5, 6],
+    'Ki': [0.00001, 0.02],
+    'Kd': [0.00001, 0.005, 0.02],
+    'max_turn_rate': [2.0, 3.0, 4.0],
+}
+
+# ===================== PUNTAJE ========================
+# Menor es mejor: segundos de vuelta, más un castigo por cada píxel medio de
+# desvío de la línea guía. La vuelta termina al volver a la estación de salida
+# (por avance sobre la pista) o al detenerse en la barra. Una corrida que no la
+# completa cuenta con el tiempo máximo y un castigo por la parte que le faltó.
+
+DEVIATION_WEIGHT = 2.0  # s por píxel de desvío medio
+UNFINISHED_PENALTY = 30.0  # s por vuelta completa sin recorrer
+
+def evaluate(track, tuning, max_time):
+    car = carro.LineFollowerCar(track, tuning=tuning, start=track.start, size=track.size)
+    total_dev = max_dev = 0.0
+    samples = 0
+    while car.sim_time < max_time and car.step():
+        dev = abs(car.cross_track)
+        total_dev += dev
+        max_dev = max(max_dev, dev)
+        samples += 1
+        if car.laps >= 1:
+            break
+    finished = car.stopping or car.laps >= 1
+    lap_time = car.sim_time if finished else max_time
+    progress = 1.0 if finished else min(abs(car.travelled) / track.length, 1.0)
+    mean_dev = total_dev / max(samples, 1)
+    score = lap_time + DEVIATION_WEIGHT * mean_dev + UNFINISHED_PENALTY * (1 - progress)
+    return {'lap_time': lap_time, 'finished': finished, 'progress': progress,
+            'mean_dev': mean_dev, 'max_dev': max_dev, 'score': score}
+
+# ===================== TRABAJADORES ========================
+
+_track = None
+
+def _init_worker(stops):
+    # Cada proceso arma la pista una sola vez; sus mosaicos los lee de disco
+    global _track
+    _track = carro.Track(stops)
+
+def _run(job):
+    tuning, max_time = job
+    return tuning, evaluate(_track, tuning, max_time)
+
+# ===================== CACHÉ ========================
+
+def cache_key(tuning, stops, max_time):
+    track_id = hashlib.sha1(json.dumps(stops).encode()).hexdigest()[:12]
+    params = sorted((name, float(value)) for name, value in tuning.items())
+    return json.dumps([CACHE_VERSION, track_id, max_time, carro.DT, params])
+
+def load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(path, cache):
+    # Temporal + reemplazo, para no dejar una caché a medias; el temporal es propio
+    # de cada proceso porque varios barridos pueden guardar a la vez
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar la caché: {e}")
+
+# ===================== BARRIDO ========================
+
+def expand_grid(grid):
+    names = list(grid)
+    return [{**carro.DEFAULT_TUNING, **dict(zip(names, values))}
+            for values in itertools.product(*(grid[name] for name in names))]
+
+def sweep(configs, stops=carro.STOPS, max_time=120.0, processes=None, cache_path=CACHE_PATH):
+    # Devuelve [(ajuste, resultado)] ordenado por puntaje y cuántos salieron de la caché
+    cache = load_cache(cache_path) if cache_path else {}
+    results = []
+    pending = []
+    for tuning in configs:
+        hit = cache.get(cache_key(tuning, stops, max_time))
+        if hit is not None:
+            results.append((tuning, hit))
+        else:
+            pending.append((tuning, max_time))
+    cached = len(results)
+
+    if pending:
+        # Los mosaicos de la pista quedan en disco antes de repartir: los procesos solo los leen
+        carro.Track(stops).tiles.build_all()
+        processes = min(processes or os.cpu_count() or 1, len(pending))
+        with mp.Pool(processes, initializer=_init_worker, initargs=(stops,)) as pool:
+            for tuning, result in pool.imap_unordered(_run, pending):
+                results.append((tuning, result))
+                cache[cache_key(tuning, stops, max_time)] = result
+        if cache_path:
+            save_cache(cache_path, cache)
+
+    results.sort(key=lambda item: item[1]['score'])
+    return results, cached
+
+def print_table(results, top):
+    print(f"{'#':>3} {'Kp':>6} {'Ki':>8} {'Kd':>8} {'giro':>5} {'suav.':>5} {'deriv.':>6} "
+          f"{'vuelta s':>8} {'desv.':>6} {'máx.':>6} {'avance':>6} {'puntaje':>8}")
+    for rank, (t, r) in enumerate(results[:top], start=1):
+        lap = f"{r['lap_time']:.1f}" if r['finished'] else '—'
+        print(f"{rank:>3} {t['Kp']:>6g} {t['Ki']:>8g} {t['Kd']:>8g} {t['max_turn_rate']:>5g} "
+              f"{t['smoothing']:>5g} {t['derivative_factor']:>6g} {lap:>8} {r['mean_dev']:>6.1f} "
+              f"{r['max_dev']:>6.1f} {r['progress']:>6.0%} {r['score']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de ganancias PID del seguidor de línea")
+    parser.add_argument('--param', action='append', default=[], metavar='NOMBRE=V1,V2,...',
+                        help=f"valores a probar ({', '.join(carro.DEFAULT_TUNING)}); "
+                             "reemplaza la rejilla por defecto, repetible")
+    parser.add_argument('--max-time', type=float, default=120.0,
+                        help="segundos simulados por corrida antes de darla por perdida")
+    parser.add_argument('--processes', type=int, default=None, help="procesos (por defecto, núcleos)")
+    parser.add_argument('--top', type=int, default=10, help="filas de la tabla")
+    parser.add_argument('--cache', default=CACHE_PATH, help="archivo JSON con resultados ya evaluados")
+    parser.add_argument('--no-cache', action='store_true', help="evaluar todo sin leer ni guardar caché")
+    args = parser.parse_args()
+    if carro.np is None:
+        parser.error("el barrido necesita NumPy para las máscaras de la pista")
+
+    grid = DEFAULT_GRID
+    if args.param:
+        grid = {}
+        for item in args.param:
+            name, _, values = item.partition('=')
+            if name not in carro.DEFAULT_TUNING:
+                parser.error(f"parámetro desconocido: {name}")
+            try:
+                grid[name] = [float(v) for v in values.split(',')]
+            except ValueError:
+                parser.error(f"valores inválidos: {item}")
+
+    configs = expand_grid(grid)
+    start = time.perf_counter()
+    results, cached = sweep(configs, max_time=args.max_time, processes=args.processes,
+                            cache_path=None if args.no_cache else args.cache)
+    elapsed = time.perf_counter() - start
+    print(f"{len(configs)} configuraciones ({cached} desde la caché) en {elapsed:.1f} s\n")
+    print_table(results, args.top)
+    best, result = results[0]
+    print(f"\nMejor configuración (puntaje {result['score']:.1f}):")
+    print(json.dumps(best))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+import os
+
+# Sin ventana: los benchmarks corren en máquinas de CI sin pantalla
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+import intnave as nave
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'bench_baseline.json')
+FOREVER = 10 ** 12  # ms: temporizadores que no vencen durante el benchmark
+
+# ===================== ESCENARIOS ========================
+# Cada escenario tiene una preparación (setup) y un piloto que devuelve la entrada de cada frame.
+# El jugador es invencible para que la partida no termine a mitad de la medición.
+
+def make_invincible(game):
+    game.make_invincible(0, FOREVER)
+
+def triple_shot(game):
+    game.player.power_level = 2
+    game.power_up(0, FOREVER)
+
+def sweep(frame, period=60):
+    left = (frame // period) % 2 == 0
+    return left, not left
+
+def setup_waves(game):
+    make_invincible(game)
+    for _ in range(9):  # 10 oleadas apiladas en total
+        game.spawn_enemies()
+
+def drive_waves(game, frame):
+    left, right = sweep(frame)
+    return nave.FrameInput(left=left, right=right)
+
+def setup_triple(game):
+    make_invincible(game)
+    triple_shot(game)
+
+def drive_triple(game, frame):
+    left, right = sweep(frame)
+    return nave.FrameInput(left=left, right=right, fire=True)
+
+def setup_bomb(game):
+    make_invincible(game)
+
+def drive_bomb(game, frame):
+    # En cada frame: formación de 200+ enemigos y una bomba justo encima del jugador.
+    # Así todos los frames medidos son de bomba y no se promedian con frames vacíos
+    # (la preparación corre antes de empezar a medir el frame)
+    while len(game.enemies) < 200:
+        game.spawn_enemies()
+    power = game.power_pool.acquire(game.player.rect.center, game.rng)
+    power.type = 'bomb'
+    return nave.NO_INPUT
+
+def setup_boss(game):
+    make_invincible(game)
+    triple_shot(game)
+    for enemy in game.enemies.sprites():
+        enemy.kill()
+    boss = nave.Boss()
+    boss.health = FOREVER
+    game.boss_group.add(boss)
+    game.all_sprites.add(boss)
+
+def drive_boss(game, frame):
+    # Sigue al jefe y dispara en todos los frames
+    player_x = game.player.rect.centerx
+    boss_x = next(iter(game.boss_group)).rect.centerx if game.boss_group else player_x
+    return nave.FrameInput(left=player_x > boss_x + 8, right=player_x < boss_x - 8, fire=True)
+
+SCENARIOS = {
+    'oleadas': (setup_waves, drive_waves),
+    'triple': (setup_triple, drive_triple),
+    'bomba': (setup_bomb, drive_bomb),
+    'jefe': (setup_boss, drive_boss),
+}
+
+# ===================== MEDICIÓN ========================
+
+def new_game(name, profiler=None):
+    game = nave.Game(seed=1, profiler=profiler)
+    setup, drive = SCENARIOS[name]
+    setup(game)
+    return game, drive
+
+def run_scenario(name, frames, screen, alloc_frames):
+    profiler = nave.FrameProfiler(window=frames)
+    game, drive = new_game(name, profiler)
+    renderer = nave.FullRenderer(screen, game)
+    atlas = nave.AtlasRenderer(screen, game)
+
+    step_ns = draw_ns = atlas_ns = 0
+    for frame in range(frames):
+        controls = drive(game, frame)
+        profiler.begin_frame()
+        start = time.perf_counter_ns()
+        game.step(controls)
+        middle = time.perf_counter_ns()
+        renderer.draw(game)
+        end = time.perf_counter_ns()
+        profiler.lap('draw')
+        # Mismo estado dibujado otra vez desde el atlas, para comparar con Group.draw
+        atlas.draw(game)
+        atlas_end = time.perf_counter_ns()
+        profiler.end_frame(game)
+        step_ns += middle - start
+        draw_ns += end - middle
+        atlas_ns += atlas_end - end
+
+    # Asignaciones en una corrida aparte: tracemalloc distorsiona los tiempos
+    game, drive = new_game(name)
+    renderer = nave.FullRenderer(screen, game)
+    tracemalloc.start()
+    alloc_bytes = 0
+    for frame in range(alloc_frames):
+        controls = drive(game, frame)
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        game.step(controls)
+        renderer.draw(game)
+        alloc_bytes += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return {
+        'ups': frames / (step_ns / 1e9),
+        'draw_ms': draw_ns / frames / 1e6,
+        'atlas_ms': atlas_ns / frames / 1e6,
+        'update_ms': profiler.p50('update'),
+        'collisions_ms': profiler.p50('collisions'),
+        'alloc_kib': alloc_bytes / alloc_frames / 1024,
+        'sprites': profiler.counts.get('sprites', 0),
+    }
+
+# Métricas comparadas con la línea base: (clave, True si más alto es mejor, piso absoluto)
+METRICS = [
+    ('ups', True, 0),
+    ('draw_ms', False, 0.2),
+    ('atlas_ms', False, 0.2),
+    ('update_ms', False, 0.2),
+    ('collisions_ms', False, 0.2),
+    ('alloc_kib', False, 4),
+]
+
+def compare(results, baseline, tolerance):
+    # Devuelve las regresiones: peor que la línea base por más de `tolerance`.
+    # Los pisos absolutos evitan falsas alarmas en métricas casi nulas.
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key, higher_is_better, floor in METRICS:
+            old, new = base.get(key), metrics[key]
+            if old is None:
+                continue
+            if higher_is_better:
+                worse = new < old * (1 - tolerance)
+            else:
+                worse = new > max(old * (1 + tolerance), old + floor)
+            if worse:
+                regressions.append(f"{name}.{key}: {old:.2f} -> {new:.2f}")
+    return regressions
+
+def print_table(results):
+    print(f"{'escenario':<10} {'upd/s':>9} {'dibujo ms':>10} {'atlas ms':>10} {'update ms':>10} "
+          f"{'colis. ms':>10} {'KiB/frame':>10} {'sprites':>8}")
+    for name, m in results.items():
+        print(f"{name:<10} {m['ups']:>9.0f} {m['draw_ms']:>10.2f} {m['atlas_ms']:>10.2f} "
+              f"{m['update_ms']:>10.2f} {m['collisions_ms']:>10.2f} {m['alloc_kib']:>10.1f} "
+              f"{m['sprites']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de estrés de SpaceMax Defender")
+    parser.add_argument('scenarios', nargs='*',
+                        help=f"escenarios a correr (por defecto, todos): {', '.join(SCENARIOS)}")
+    parser.add_argument('--frames', type=int, default=600, help="frames medidos por escenario")
+    parser.add_argument('--alloc-frames', type=int, default=120,
+                        help="frames de la pasada que cuenta asignaciones")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="archivo JSON de línea base")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="guardar estos resultados como nueva línea base")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="empeoramiento relativo permitido antes de fallar (0.15 = 15%%)")
+    parser.add_argument('--ci', action='store_true', default=bool(os.environ.get('CI')),
+                        help="fallar si no hay línea base (activo si la variable CI está definida)")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"escenario desconocido: {', '.join(unknown)}")
+
+    pygame.init()
+    screen = pygame.display.set_mode((nave.WIDTH, nave.HEIGHT))
+    nave.load_assets()
+
+    results = {}
+    for name in args.scenarios or SCENARIOS:
+        results[name] = run_scenario(name, args.frames, screen, args.alloc_frames)
+    pygame.quit()
+    print_table(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Sin línea base para comparar (usa --save-baseline)")
+        return 1 if args.ci else 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"❌ Regresión en {line}")
+    if not regressions:
+        print("✅ Sin regresiones respecto a la línea base")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import os
+
+# Los entornos nunca abren ventana
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import multiprocessing as mp
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pygame
+
+import intnave as nave
+
+# ===================== OBSERVACIÓN ========================
+# Vector float32 de tamaño fijo. Posiciones normalizadas a [0, 1] (centro del sprite).
+#   jugador: x, y, vidas, nivel de poder, invencible
+#   jefe: presente, x, y, vida
+#   por cada grupo, hasta N ranuras (presente, x, y); los enemigos más cercanos
+#   al jugador van primero y las ranuras sobrantes quedan en cero
+
+MAX_ENEMIES = 48
+MAX_GHOSTS = 4
+MAX_BULLETS = 16
+MAX_POWERS = 4
+SLOTS = (('enemies', MAX_ENEMIES), ('ghosts', MAX_GHOSTS), ('bullets', MAX_BULLETS), ('powers', MAX_POWERS))
+OBS_SIZE = 5 + 4 + 3 * sum(n for _, n in SLOTS)
+
+# Acciones discretas: 0 nada, 1 izquierda, 2 derecha, 3 disparar, 4 izq+disparar, 5 der+disparar
+ACTIONS = [
+    nave.FrameInput(),
+    nave.FrameInput(left=True),
+    nave.FrameInput(right=True),
+    nave.FrameInput(fire=True),
+    nave.FrameInput(left=True, fire=True),
+    nave.FrameInput(right=True, fire=True),
+]
+
+_assets_ready = False
+
+def _init_pygame():
+    # Una vez por proceso: los trabajadores del pool también pasan por aquí
+    global _assets_ready
+    if not _assets_ready:
+        pygame.init()
+        nave.load_assets(convert=False)
+        _assets_ready = True
+
+class SpaceMaxEnv:
+    # Interfaz estilo gym sobre nave.Game: reset() -> obs, step(acción) -> (obs, recompensa, fin, info)
+    def __init__(self, seed=None, max_frames=18000, numpy_enemies=False):
+        _init_pygame()
+        self.seed = seed
+        self.max_frames = max_frames
+        self.numpy_enemies = numpy_enemies
+        self.game = None
+        self.obs = np.zeros(OBS_SIZE, np.float32)
+
+    def reset(self, seed=None, out=None):
+        if seed is not None:
+            self.seed = seed
+        self.game = nave.Game(seed=self.seed, numpy_enemies=self.numpy_enemies)
+        return self.observe(out)
+
+    def step(self, action, out=None):
+        game = self.game
+        player = game.player
+        score, lives = player.score, player.lives
+        game.step(ACTIONS[action])
+
+        # Recompensa: puntos ganados (en centenas) y castigo por vida perdida
+        reward = (player.score - score) / 100 - 5 * max(lives - player.lives, 0)
+        done = game.game_over or game.frame >= self.max_frames
+        info = {'score': player.score, 'frame': game.frame}
+        return self.observe(out), reward, done, info
+
+    def observe(self, out=None):
+        obs = self.obs if out is None else out
+        obs[:] = 0
+        game = self.game
+        player = game.player
+        px, py = player.rect.center
+        obs[0:5] = (px / nave.WIDTH, py / nave.HEIGHT, player.lives, player.power_level,
+                    player.invincible)
+        for boss in game.boss_group:
+            obs[5:9] = (1, boss.rect.centerx / nave.WIDTH, boss.rect.centery / nave.HEIGHT, boss.health)
+
+        i = 9
+        for name, limit in SLOTS:
+            sprites = getattr(game, name).sprites()
+            if name == 'enemies' and len(sprites) > limit:
+                sprites.sort(key=lambda s: (s.rect.centerx - px) ** 2 + (s.rect.centery - py) ** 2)
+            for sprite in sprites[:limit]:
+                obs[i:i + 3] = (1, sprite.rect.centerx / nave.WIDTH, sprite.rect.centery / nave.HEIGHT)
+                i += 3
+            i += 3 * (limit - min(len(sprites), limit))
+        return obs
+
+# ===================== ENTORNOS VECTORIZADOS ========================
+
+def _worker(conn, shm_name, n_envs, first, count, max_frames, numpy_enemies):
+    # Cada proceso maneja las filas [first, first + count) de la memoria compartida
+    shm = shared_memory.SharedMemory(name=shm_name)
+    obs = np.ndarray((n_envs, OBS_SIZE), np.float32, buffer=shm.buf)[first:first + count]
+    envs = [SpaceMaxEnv(max_frames=max_frames, numpy_enemies=numpy_enemies) for _ in range(count)]
+    try:
+        while True:
+            cmd, data = conn.recv()
+            if cmd == 'reset':
+                for k, env in enumerate(envs):
+                    env.reset(data[k], out=obs[k])
+                conn.send(None)
+            elif cmd == 'step':
+                rewards, dones, infos = [], [], []
+                for k, env in enumerate(envs):
+                    _, reward, done, info = env.step(data[k], out=obs[k])
+                    if done:
+                        # Reinicio automático: la fila ya trae la primera observación del episodio nuevo.
+                        # La semilla avanza de a n_envs para no repetir la de otro entorno
+                        info['terminal_score'] = info['score']
+                        env.reset(env.seed + n_envs if env.seed is not None else None, out=obs[k])
+                    rewards.append(reward)
+                    dones.append(done)
+                    infos.append(info)
+                conn.send((rewards, dones, infos))
+            elif cmd == 'close':
+                break
+    finally:
+        del obs
+        shm.close()
+        conn.close()
+
+class VecSpaceMaxEnv:
+    # N juegos independientes repartidos en un pool de procesos. Las observaciones
+    # se escriben directo en un bloque de memoria compartida (n_envs x OBS_SIZE).
+    def __init__(self, n_envs, seed=0, processes=None, max_frames=18000, numpy_enemies=False):
+        self.n_envs = n_envs
+        self.seed = seed
+        processes = min(processes or os.cpu_count() or 1, n_envs)
+        self.shm = shared_memory.SharedMemory(create=True, size=n_envs * OBS_SIZE * 4)
+        self.obs = np.ndarray((n_envs, OBS_SIZE), np.float32, buffer=self.shm.buf)
+
+        self.conns = []
+        self.procs = []
+        self.slices = []
+        base, extra = divmod(n_envs, processes)
+        first = 0
+        for p in range(processes):
+            count = base + (p < extra)
+            parent, child = mp.Pipe()
+            proc = mp.Process(target=_worker, daemon=True,
+                              args=(child, self.shm.name, n_envs, first, count, max_frames, numpy_enemies))
+            proc.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(proc)
+            self.slices.append((first, first + count))
+            first += count
+
+    def reset(self):
+        for conn, (a, b) in zip(self.conns, self.slices):
+            conn.send(('reset', [self.seed + i for i in range(a, b)]))
+        for conn in self.conns:
+            conn.recv()
+        return self.obs
+
+    def step(self, actions):
+        # Primero se envían todas las acciones para que los procesos trabajen en paralelo
+        for conn, (a, b) in zip(self.conns, self.slices):
+            conn.send(('step', list(actions[a:b])))
+        rewards, dones, infos = [], [], []
+        for conn in self.conns:
+            r, d, i = conn.recv()
+            rewards += r
+            dones += d
+            infos += i
+        return self.obs, np.array(rewards, np.float32), np.array(dones), infos
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(('close', None))
+        for proc in self.procs:
+            proc.join()
+        del self.obs
+        self.shm.close()
+        self.shm.unlink()
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de los entornos vectorizados")
+    parser.add_argument('--envs', type=int, default=8, help="número de juegos independientes")
+    parser.add_argument('--processes', type=int, default=None, help="procesos (por defecto, núcleos)")
+    parser.add_argument('--steps', type=int, default=1000, help="pasos por juego")
+    parser.add_argument('--numpy', action='store_true', help="usar el almacén NumPy de enemigos")
+    args = parser.parse_args()
+
+    env = VecSpaceMaxEnv(args.envs, processes=args.processes, numpy_enemies=args.numpy)
+    rng = random.Random(0)
+    env.reset()
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, dones, _ = env.step([rng.randrange(len(ACTIONS)) for _ in range(args.envs)])
+        episodes += int(dones.sum())
+    elapsed = time.perf_counter() - start
+    env.close()
+
+    total = args.steps * args.envs
+    print(f"{args.envs} juegos en {len(env.procs)} procesos: {total} pasos en {elapsed:.2f} s "
+          f"({total / elapsed:.0f} pasos/s), {episodes} episodios terminados")
+
+if __name__ == '__main__':
+    main()
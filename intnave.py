@@ -1,59 +1,491 @@
 import pygame
 import random
 import os
+import time
+import argparse
+import bisect
+import heapq
+import csv
+import json
+import mmap
+import struct
+import zlib
+from collections import namedtuple, deque
 
-# Inicializar Pygame
-pygame.init()
+# NumPy es opcional: solo lo usa el almacén vectorizado de enemigos (--numpy)
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Configuración de pantalla
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("SpaceMax Defender: Power Edition")
+FPS = 60
+
+# Paso fijo de la lógica: todas las velocidades están en píxeles por paso
+STEP_MS = 1000 / FPS
+MAX_STEPS_PER_FRAME = 5  # con más atraso que esto el juego se ralentiza en vez de saltar más
 
 # Rutas de recursos
 current_path = os.path.dirname(__file__)
 assets_path = os.path.join(current_path, 'assets')
 img_path = os.path.join(assets_path, 'images')
 
-# Cargar imágenes y escalarlas
-player_img = pygame.transform.scale(
-    pygame.image.load(os.path.join(img_path, 'player.jpg')).convert_alpha(), (60, 60)
-)
+# ===================== RECURSOS ========================
+
+player_img = None
+enemy_imgs = []
+ghost_img = None
+bullet_img = None
+background = None
+power_img = None
+explosion_img = None
 
-enemy_imgs = [
-    pygame.transform.scale(pygame.image.load(os.path.join(img_path, 'enemy1.png')).convert_alpha(), (50, 50)),
-    pygame.transform.scale(pygame.image.load(os.path.join(img_path, 'enemy2.png')).convert_alpha(), (50, 50)),
-    pygame.transform.scale(pygame.image.load(os.path.join(img_path, 'enemy3.png')).convert_alpha(), (50, 50))
+# Imágenes del juego: (clave, archivo, tamaño final, con alfa)
+ASSET_SPECS = [
+    ('player', 'player.jpg', (60, 60), True),
+    ('enemy1', 'enemy1.png', (50, 50), True),
+    ('enemy2', 'enemy2.png', (50, 50), True),
+    ('enemy3', 'enemy3.png', (50, 50), True),
+    ('bullet', 'bullet.jpg', (10, 20), True),
+    ('background', 'background.jpg', (WIDTH, HEIGHT), False),
+    ('power', 'multi.jpg', (30, 30), True),
+    ('explosion', 'kabum.jpg', (30, 30), True),  # opcional
 ]
+OPTIONAL_ASSETS = {'explosion'}
 
-ghost_img = enemy_imgs[2]  # Fantasma
+# Caché de píxeles ya decodificados y escalados, leída con mmap al arrancar
+cache_path = os.path.join(assets_path, '.cache', 'sprites.bin')
+CACHE_MAGIC = b'NAVECACH'
+CACHE_VERSION = 1
+_cache_map = None  # mmap vivo: las superficies sin convert() apuntan a su memoria
+_derived = {}
 
-bullet_img = pygame.transform.scale(
-    pygame.image.load(os.path.join(img_path, 'bullet.jpg')).convert_alpha(), (10, 20)
-)
+def load_image(name, size, alpha=True, convert=True):
+    img = pygame.image.load(os.path.join(img_path, name))
+    # convert()/convert_alpha() necesitan una ventana; en modo headless se omiten
+    if convert:
+        img = img.convert_alpha() if alpha else img.convert()
+    return pygame.transform.scale(img, size)
 
-background = pygame.transform.scale(
-    pygame.image.load(os.path.join(img_path, 'background.jpg')).convert(), (WIDTH, HEIGHT)
-)
+def _source_stamp(name):
+    # La caché se invalida si cambia la fecha de modificación o el tamaño del archivo
+    try:
+        st = os.stat(os.path.join(img_path, name))
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
 
-power_img = pygame.transform.scale(
-    pygame.image.load(os.path.join(img_path, 'multi.jpg')).convert_alpha(), (30, 30)
-)
+def _read_cache():
+    global _cache_map
+    try:
+        f = open(cache_path, 'rb')
+    except OSError:
+        return None
+    with f:
+        head = f.read(12)
+        if len(head) < 12 or head[:8] != CACHE_MAGIC:
+            return None
+        (header_len,) = struct.unpack('<I', head[8:])
+        try:
+            header = json.loads(f.read(header_len))
+        except ValueError:
+            return None
+        if header.get('version') != CACHE_VERSION or header.get('pygame') != pygame.version.ver:
+            return None
+        entries = header['entries']
+        for key, name, size, alpha in ASSET_SPECS:
+            entry = entries.get(key)
+            if entry is None or entry['stamp'] != _source_stamp(name) or entry['size'] != list(size):
+                return None
+        # ACCESS_COPY: si algo escribiera en una superficie no tocaría el archivo
+        cache_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    view = memoryview(cache_map)
+    start = 12 + header_len
+    surfaces = {}
+    for key, name, size, alpha in ASSET_SPECS:
+        entry = entries[key]
+        if 'offset' in entry:
+            offset = start + entry['offset']
+            surfaces[key] = pygame.image.frombuffer(view[offset:offset + entry['length']],
+                                                    size, entry['format'])
+    _cache_map = cache_map
+    return surfaces
+
+def _decode_sources():
+    surfaces = {}
+    for key, name, size, alpha in ASSET_SPECS:
+        try:
+            surfaces[key] = load_image(name, size, alpha, convert=False)
+        except (pygame.error, FileNotFoundError):
+            if key not in OPTIONAL_ASSETS:
+                raise
+    return surfaces
+
+def _write_cache(surfaces):
+    entries = {}
+    blobs = []
+    offset = 0
+    for key, name, size, alpha in ASSET_SPECS:
+        entry = {'stamp': _source_stamp(name), 'size': list(size)}
+        surf = surfaces.get(key)
+        if surf is not None:
+            fmt = 'RGBA' if alpha else 'RGB'
+            data = pygame.image.tobytes(surf, fmt)
+            entry.update(format=fmt, offset=offset, length=len(data))
+            blobs.append(data)
+            offset += len(data)
+        entries[key] = entry
+    header = json.dumps({'version': CACHE_VERSION, 'pygame': pygame.version.ver,
+                         'entries': entries}).encode()
+
+    # Se escribe en un temporal y se reemplaza, para no dejar una caché a medias.
+    # Temporal propio de cada proceso: varios pueden armar la caché a la vez
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(CACHE_MAGIC + struct.pack('<I', len(header)) + header)
+            for data in blobs:
+                f.write(data)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar la caché de imágenes: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def load_assets(convert=True, use_cache=True):
+    global player_img, enemy_imgs, ghost_img, bullet_img, background, power_img, explosion_img
+
+    surfaces = _read_cache() if use_cache else None
+    if surfaces is None:
+        # Decodificar y escalar desde los archivos originales una sola vez
+        surfaces = _decode_sources()
+        if use_cache:
+            _write_cache(surfaces)
+
+    # convert()/convert_alpha() necesitan una ventana; en modo headless se omiten
+    if convert:
+        surfaces = {key: surf.convert() if key == 'background' else surf.convert_alpha()
+                    for key, surf in surfaces.items()}
+    _derived.clear()
+
+    player_img = surfaces['player']
+    enemy_imgs = [surfaces['enemy1'], surfaces['enemy2'], surfaces['enemy3']]
+    ghost_img = enemy_imgs[2]  # Fantasma
+    bullet_img = surfaces['bullet']
+    background = surfaces['background']
+    power_img = surfaces['power']
+
+    # (Opcional) Imagen de explosión simple, si no está se usa un círculo rojo
+    explosion_img = surfaces.get('explosion')
+    if explosion_img is None:
+        print("⚠️ No se encontró 'explosion.png'. Usaré efecto alternativo.")
+
+def derived(key, factory):
+    # Superficies derivadas (escaladas, dibujadas) que se crean la primera vez que se piden
+    surf = _derived.get(key)
+    if surf is None:
+        surf = _derived[key] = factory()
+    return surf
+
+def boss_image():
+    return derived('boss', lambda: pygame.transform.scale(enemy_imgs[1], (120, 100)))
+
+def _make_explosion_fallback():
+    surf = pygame.Surface((30, 30), pygame.SRCALPHA)
+    pygame.draw.circle(surf, (255, 0, 0), (15, 15), 15)
+    return surf
+
+def explosion_image():
+    if explosion_img:
+        return explosion_img
+    return derived('explosion', _make_explosion_fallback)
+
+# ===================== RELOJES ========================
+
+class SimClock:
+    # Tiempo simulado: avanza un paso fijo por frame, sin reloj de pared
+    def __init__(self, step_ms=STEP_MS):
+        self.step_ms = step_ms
+        self.ms = 0.0
+
+    def advance(self):
+        self.ms += self.step_ms
+
+    def get_ticks(self):
+        return int(self.ms)
+
+# ===================== PLANIFICADOR ========================
+
+class Timer:
+    __slots__ = ('at', 'callback', 'args', 'cancelled')
+
+    def __init__(self, at, callback, args):
+        self.at = at
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class Scheduler:
+    # Callbacks con plazo en un montículo ordenado por (plazo, orden de alta).
+    # run() solo mira la cima, así que un frame sin vencimientos cuesta lo mismo
+    # con 2 que con 2000 temporizadores pendientes. Cancelar solo marca el
+    # temporizador; se descarta cuando llega a la cima.
+    # La clave no tiene por qué ser tiempo: sirve con cualquier valor que crece,
+    # como el puntaje. Vence cuando run(now) recibe now >= plazo.
+    def __init__(self):
+        self.heap = []
+        self.seq = 0
+        self.offset = 0  # tiempo total en pausa: los plazos internos no lo cuentan
+        self.paused_at = None
+        self.fired = 0
+
+    def call_at(self, at, callback, *args):
+        # callback(now, *args) se llama en el primer run() con now >= at
+        timer = Timer(at, callback, args)
+        self.seq += 1
+        heapq.heappush(self.heap, (at - self.offset, self.seq, timer))
+        return timer
+
+    def run(self, now):
+        if self.paused_at is not None:
+            return
+        heap = self.heap
+        local = now - self.offset
+        # Un callback puede programar otro temporizador ya vencido: también se dispara ahora
+        while heap and heap[0][0] <= local:
+            timer = heapq.heappop(heap)[2]
+            if not timer.cancelled:
+                self.fired += 1
+                timer.callback(now, *timer.args)
+
+    def pause(self, now):
+        if self.paused_at is None:
+            self.paused_at = now
+
+    def resume(self, now):
+        # Los plazos pendientes se corren lo que duró la pausa
+        if self.paused_at is not None:
+            self.offset += now - self.paused_at
+            self.paused_at = None
+
+    def clear(self):
+        self.heap.clear()
+        self.offset = 0
+        self.paused_at = None
+
+    def __len__(self):
+        return sum(not timer.cancelled for _, _, timer in self.heap)
+
+# Entrada de un frame: teclas mantenidas (left/right) y pulsaciones (fire/restart)
+FrameInput = namedtuple('FrameInput', ['left', 'right', 'fire', 'restart'], defaults=[False] * 4)
+NO_INPUT = FrameInput()
+
+# ===================== COLISIONES (HASH ESPACIAL) ========================
+
+# Tamaño de celda: mayor que los sprites pequeños para que casi todos ocupen 1-4 celdas
+CELL_SIZE = 64
+
+class CollisionStats:
+    def __init__(self):
+        self.tests = 0
+        self.skipped = 0
+
+    def reset(self):
+        self.tests = 0
+        self.skipped = 0
+
+collision_stats = CollisionStats()
+
+class SpatialHash:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.spans = {}
+
+    def _span(self, rect):
+        # right/bottom son exclusivos: un rect que solo toca el borde no ocupa la celda vecina
+        cs = self.cell_size
+        return (rect.left // cs, rect.top // cs,
+                max(rect.right - 1, rect.left) // cs, max(rect.bottom - 1, rect.top) // cs)
+
+    def insert(self, sprite, span=None):
+        if span is None:
+            span = self._span(sprite.rect)
+        self.spans[sprite] = span
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket is None:
+                    bucket = self.cells[(cx, cy)] = {}
+                bucket[sprite] = None
+
+    def remove(self, sprite):
+        span = self.spans.pop(sprite, None)
+        if span is None:
+            return
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.cells[(cx, cy)]
+                del bucket[sprite]
+                if not bucket:
+                    del self.cells[(cx, cy)]
+
+    def move(self, sprite):
+        # Solo se tocan los cubos si el sprite cambió de celdas
+        span = self._span(sprite.rect)
+        if self.spans.get(sprite) != span:
+            self.remove(sprite)
+            self.insert(sprite, span)
+
+    def query(self, rect):
+        x0, y0, x1, y1 = self._span(rect)
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return found
+
+class HashedGroup(pygame.sprite.Group):
+    def __init__(self, *sprites):
+        self.spatial = SpatialHash()
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.spatial.insert(sprite)
+        # Referencia directa a los hashes del sprite: rehash() no recorre sprite.groups()
+        sprite.__dict__.setdefault('spatial_hashes', []).append(self.spatial)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.spatial.remove(sprite)
+        sprite.spatial_hashes.remove(self.spatial)
+
+def rehash(sprite):
+    # Llamar después de mover el rect de un sprite dentro de update()
+    for spatial in sprite.__dict__.get('spatial_hashes', ()):
+        spatial.move(sprite)
+
+# Equivalentes de spritecollide/groupcollide que solo prueban los candidatos del hash
+def spritecollide(sprite, group, dokill):
+    rect = sprite.rect
+    candidates = group.spatial.query(rect)
+    collision_stats.tests += len(candidates)
+    collision_stats.skipped += len(group) - len(candidates)
+    hits = [s for s in candidates if rect.colliderect(s.rect)]
+    if dokill:
+        for s in hits:
+            s.kill()
+    return hits
+
+def groupcollide(groupa, groupb, dokilla, dokillb):
+    # Se recorre el grupo más chico y se consulta el hash del más grande
+    if len(groupa) <= len(groupb):
+        crashed = {}
+        for s in groupa.sprites():
+            collided = spritecollide(s, groupb, dokillb)
+            if collided:
+                crashed[s] = collided
+                if dokilla:
+                    s.kill()
+        return crashed
+
+    pairs = []
+    for b in groupb.sprites():
+        rect = b.rect
+        candidates = groupa.spatial.query(rect)
+        collision_stats.tests += len(candidates)
+        collision_stats.skipped += len(groupa) - len(candidates)
+        hits = [a for a in candidates if rect.colliderect(a.rect)]
+        if hits:
+            pairs.append((b, hits))
+    if not pairs:
+        return {}
+
+    # Mismo resultado que recorrer groupa en orden: con dokillb, cada sprite de
+    # groupb se lo lleva el primero de groupa que lo toca
+    order = {s: i for i, s in enumerate(groupa.sprites())}
+    crashed = {}
+    for b, hits in pairs:
+        if dokillb:
+            hits = [min(hits, key=order.__getitem__)]
+        for a in hits:
+            crashed.setdefault(a, []).append(b)
+    crashed = {a: crashed[a] for a in sorted(crashed, key=order.__getitem__)}
+    if dokillb:
+        for b, _ in pairs:
+            b.kill()
+    if dokilla:
+        for a in crashed:
+            a.kill()
+    return crashed
+
+# ===================== POOLS DE SPRITES ========================
+
+class SpritePool:
+    # Recicla sprites muertos (con su Rect e imagen) en lugar de crear objetos nuevos.
+    # acquire() los vuelve a meter en los mismos grupos a los que pertenecían.
+    def __init__(self, cls, *groups):
+        self.cls = cls
+        self.groups = groups
+        self.free = []
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, *args):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.reset(*args)
+            self.hits += 1
+        else:
+            sprite = self.cls(*args)
+            sprite.pool = self
+            self.misses += 1
+        sprite.add(*self.groups)
+        return sprite
+
+    def release(self, sprite):
+        self.free.append(sprite)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'free': len(self.free),
+                'hit_rate': self.hits / total if total else 0.0}
+
+class PooledSprite(pygame.sprite.DirtySprite):
+    # pygame.sprite.Sprite conserva su __dict__, así que los __slots__ de las
+    # subclases solo compactan el estado propio de cada sprite
+    __slots__ = ('pool',)
+
+    def __init__(self):
+        super().__init__()
+        self.pool = None
+
+    def kill(self):
+        # alive() evita devolver al pool dos veces un sprite ya muerto
+        if self.alive():
+            super().kill()
+            if self.pool is not None:
+                self.pool.release(self)
 
-# (Opcional) Imagen de explosión simple, si no está se usa un círculo rojo
-explosion_img = None
-try:
-    explosion_img = pygame.transform.scale(
-        pygame.image.load(os.path.join(img_path, 'kabum.jpg')).convert_alpha(), (30, 30)
-    )
-except:
-    print("⚠️ No se encontró 'explosion.png'. Usaré efecto alternativo.")
-
-# Reloj
-clock = pygame.time.Clock()
 # ===================== CLASES ========================
 
-class Player(pygame.sprite.Sprite):
+# Todos los sprites son DirtySprite: marcan dirty = 1 al moverse para que el
+# renderizador por rectángulos sucios solo repinte lo que cambió
+
+class Player(pygame.sprite.DirtySprite):
     def __init__(self):
         super().__init__()
         self.image = player_img
@@ -64,103 +496,121 @@ class Player(pygame.sprite.Sprite):
         self.lives = 3
         self.score = 0
         self.power_level = 1
-        self.power_timer = 0
+        self.power_timer = None  # Timer del planificador que termina el disparo múltiple
         self.invincible = False
-        self.invincible_timer = 0
+        self.invincible_timer = None
+        self.controls = NO_INPUT
 
-    def update(self):
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT] and self.rect.left > 0:
+    def update(self, now):
+        if self.controls.left and self.rect.left > 0:
             self.rect.x -= self.speed
-        if keys[pygame.K_RIGHT] and self.rect.right < WIDTH:
+            self.dirty = 1
+        if self.controls.right and self.rect.right < WIDTH:
             self.rect.x += self.speed
+            self.dirty = 1
+        # La invencibilidad y el disparo múltiple los termina el planificador del juego
 
-        # Invencibilidad temporal
-        if self.invincible and pygame.time.get_ticks() > self.invincible_timer:
-            self.invincible = False
-
-        # Disparo múltiple se reinicia después de 10 segundos
-        if self.power_level > 1 and pygame.time.get_ticks() > self.power_timer:
-            self.power_level = 1
-
-class Enemy(pygame.sprite.Sprite):
+class Enemy(pygame.sprite.DirtySprite):
     def __init__(self, x, y, type):
         super().__init__()
         self.image = enemy_imgs[type]
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
+        self.type = type
         self.speed = 2
         self.direction = 1
+        self.store = None  # EnemyStore que lo mueve, si se usa el backend NumPy
+        self.slot = -1
 
-    def update(self):
+    def kill(self):
+        if self.store is not None:
+            self.store.discard(self)
+        super().kill()
+
+    def update(self, now):
+        if self.store is not None:
+            return  # lo mueve EnemyStore.step()
         self.rect.x += self.speed * self.direction
         if self.rect.right >= WIDTH or self.rect.left <= 0:
             self.direction *= -1
             self.rect.y += 30
+        self.dirty = 1
+        rehash(self)
 
-class Ghost(pygame.sprite.Sprite):
-    def __init__(self):
+class Ghost(PooledSprite):
+    __slots__ = ('speed_y',)
+
+    def __init__(self, rng):
         super().__init__()
         self.image = ghost_img
         self.rect = self.image.get_rect()
-        self.rect.x = random.randint(0, WIDTH - self.rect.width)
+        self.reset(rng)
+
+    def reset(self, rng):
+        self.rect.x = rng.randint(0, WIDTH - self.rect.width)
         self.rect.y = -50
-        self.speed_y = random.randint(3, 7)
+        self.speed_y = rng.randint(3, 7)
+        self.dirty = 1
 
-    def update(self):
+    def update(self, now):
         self.rect.y += self.speed_y
         if self.rect.top > HEIGHT:
             self.kill()
+        else:
+            self.dirty = 1
+            rehash(self)
+
+class Bullet(PooledSprite):
+    __slots__ = ('speed',)
 
-class Bullet(pygame.sprite.Sprite):
     def __init__(self, x, y, speed):
         super().__init__()
         self.image = bullet_img
         self.rect = self.image.get_rect()
+        self.reset(x, y, speed)
+
+    def reset(self, x, y, speed):
         self.rect.centerx = x
         self.rect.bottom = y
         self.speed = speed
+        self.dirty = 1
 
-    def update(self):
+    def update(self, now):
         self.rect.y += self.speed
         if self.rect.bottom < 0 or self.rect.top > HEIGHT:
             self.kill()
+        else:
+            self.dirty = 1
+            rehash(self)
+
+class PowerUp(PooledSprite):
+    __slots__ = ('speedy', 'type')
 
-class PowerUp(pygame.sprite.Sprite):
-    def __init__(self, center):
+    def __init__(self, center, rng):
         super().__init__()
         self.image = power_img
         self.rect = self.image.get_rect()
-        self.rect.center = center
         self.speedy = 3
-        self.type = random.choice(['x2', 'x3', 'shield', 'life', 'bomb'])
+        self.reset(center, rng)
 
-    def update(self):
+    def reset(self, center, rng):
+        self.rect.center = center
+        self.type = rng.choice(['x2', 'x3', 'shield', 'life', 'bomb'])
+        self.dirty = 1
+
+    def update(self, now):
         self.rect.y += self.speedy
         if self.rect.top > HEIGHT:
             self.kill()
-
-class Explosion(pygame.sprite.Sprite):
-    def __init__(self, center):
-        super().__init__()
-        if explosion_img:
-            self.image = explosion_img
         else:
-            self.image = pygame.Surface((30, 30), pygame.SRCALPHA)
-            pygame.draw.circle(self.image, (255, 0, 0), (15, 15), 15)
-        self.rect = self.image.get_rect()
-        self.rect.center = center
-        self.timer = pygame.time.get_ticks() + 300
+            self.dirty = 1
+            rehash(self)
 
-    def update(self):
-        if pygame.time.get_ticks() > self.timer:
-            self.kill()
-
-class Boss(pygame.sprite.Sprite):
+class Boss(pygame.sprite.DirtySprite):
     def __init__(self):
         super().__init__()
-        self.image = pygame.transform.scale(enemy_imgs[1], (120, 100))
+        self.image = boss_image()
         self.rect = self.image.get_rect()
         self.rect.centerx = WIDTH // 2
         self.rect.y = 20
@@ -168,174 +618,1153 @@ class Boss(pygame.sprite.Sprite):
         self.health = 10
         self.direction = 1
 
-    def update(self):
+    def update(self, now):
         self.rect.x += self.speed * self.direction
         if self.rect.left <= 0 or self.rect.right >= WIDTH:
             self.direction *= -1
-# ===================== INICIALIZACIÓN DE GRUPOS Y OBJETOS ========================
-
-all_sprites = pygame.sprite.Group()
-enemies = pygame.sprite.Group()
-ghosts = pygame.sprite.Group()
-bullets = pygame.sprite.Group()
-powers = pygame.sprite.Group()
-explosions = pygame.sprite.Group()
-boss_group = pygame.sprite.Group()
-
-player = Player()
-all_sprites.add(player)
-
-def spawn_enemies():
-    for row in range(3):
-        for col in range(8):
+        self.dirty = 1
+
+# ===================== PARTÍCULAS (EXPLOSIONES) ========================
+
+EXPLOSION_LIFE = 300  # ms
+EXPLOSION_FRAMES = 5
+
+def _make_explosion_frames():
+    # Animación: la explosión crece del 60% al 120% y se va desvaneciendo
+    base = explosion_image()
+    frames = []
+    for i in range(EXPLOSION_FRAMES):
+        t = i / (EXPLOSION_FRAMES - 1)
+        size = (round(base.get_width() * (0.6 + 0.6 * t)), round(base.get_height() * (0.6 + 0.6 * t)))
+        frame = pygame.transform.scale(base, size)
+        frame.set_alpha(255 - round(135 * t))
+        frames.append(frame)
+    return frames
+
+def explosion_frames():
+    return derived('explosion_frames', _make_explosion_frames)
+
+class ParticleSystem:
+    # Explosiones guardadas en listas paralelas (centro, inicio, fin) en lugar de un
+    # sprite por efecto. Con vida uniforme terminan en el orden en que se crearon,
+    # así que las vencidas se borran de una vez por el principio de las listas.
+    def __init__(self, life=EXPLOSION_LIFE):
+        self.life = life
+        self.uniform = True
+        self.x = []
+        self.y = []
+        self.start = []
+        self.end = []
+        self.now = 0
+
+    def __len__(self):
+        return len(self.x)
+
+    def spawn(self, center, now, life=None):
+        if life is not None and life != self.life:
+            self.uniform = False
+        self.x.append(center[0])
+        self.y.append(center[1])
+        self.start.append(now)
+        self.end.append(now + (self.life if life is None else life))
+
+    def clear(self):
+        del self.x[:], self.y[:], self.start[:], self.end[:]
+        self.uniform = True
+
+    def update(self, now):
+        self.now = now
+        end = self.end
+        if not end:
+            return
+        if self.uniform:
+            # Una explosión sigue viva mientras now <= fin, igual que el antiguo sprite
+            expired = bisect.bisect_left(end, now)
+            if expired:
+                del self.x[:expired], self.y[:expired], self.start[:expired], end[:expired]
+        elif now > min(end):
+            keep = [i for i, e in enumerate(end) if now <= e]
+            self.x = [self.x[i] for i in keep]
+            self.y = [self.y[i] for i in keep]
+            self.start = [self.start[i] for i in keep]
+            self.end = [end[i] for i in keep]
+            if not keep:
+                self.uniform = True
+
+    def placements(self):
+        # (cuadro de la animación, esquina superior izquierda) de cada explosión viva
+        frames = explosion_frames()
+        offsets = derived('explosion_offsets',
+                          lambda: [(f.get_width() // 2, f.get_height() // 2) for f in frames])
+        last = len(frames) - 1
+        now = self.now
+        for x, y, start, end in zip(self.x, self.y, self.start, self.end):
+            k = min((now - start) * len(frames) // max(end - start, 1), last)
+            ox, oy = offsets[k]
+            yield frames[k], (x - ox, y - oy)
+
+    def draw(self, surface):
+        # Un solo Surface.blits para todas las explosiones; devuelve las áreas pintadas
+        if not self.x:
+            return []
+        return surface.blits(list(self.placements()))
+
+# ===================== ENEMIGOS VECTORIZADOS (NUMPY) ========================
+
+class EnemyStore:
+    # Guarda la formación en arreglos (estructura de arreglos). step() mueve, rebota y
+    # descarta a todos los enemigos de una vez; los Rect se sincronizan después solo
+    # para dibujar y para las colisiones. Los slots se asignan en orden de creación,
+    # así que el orden de los arreglos es el mismo que el del grupo enemies.
+    def __init__(self, capacity=64):
+        self.count = 0  # slots usados (vivos y muertos)
+        self.live = 0
+        self.culled = 0
+        self.sprites = []
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        old = getattr(self, 'x', None)
+        arrays = {}
+        for name, dtype in (('x', np.int32), ('y', np.int32), ('w', np.int32), ('h', np.int32),
+                            ('speed', np.int32), ('direction', np.int32), ('type', np.int8),
+                            ('alive', np.bool_)):
+            array = np.zeros(capacity, dtype)
+            if old is not None:
+                array[:self.count] = getattr(self, name)[:self.count]
+            arrays[name] = array
+        self.__dict__.update(arrays)
+
+    def add(self, enemy):
+        if self.count == len(self.x):
+            self._alloc(len(self.x) * 2)
+        i = self.count
+        rect = enemy.rect
+        self.x[i], self.y[i], self.w[i], self.h[i] = rect.x, rect.y, rect.width, rect.height
+        self.speed[i] = enemy.speed
+        self.direction[i] = enemy.direction
+        self.type[i] = enemy.type
+        self.alive[i] = True
+        self.sprites.append(enemy)
+        enemy.store = self
+        enemy.slot = i
+        self.count += 1
+        self.live += 1
+
+    def discard(self, enemy):
+        i = enemy.slot
+        # El sprite conserva su dirección por si se sigue usando fuera del almacén
+        enemy.direction = int(self.direction[i])
+        self.alive[i] = False
+        self.sprites[i] = None
+        enemy.store = None
+        self.live -= 1
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive[:self.count])
+        for name in ('x', 'y', 'w', 'h', 'speed', 'direction', 'type', 'alive'):
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.sprites = [self.sprites[i] for i in keep.tolist()]
+        for slot, sprite in enumerate(self.sprites):
+            sprite.slot = slot
+        self.count = len(keep)
+
+    def step(self):
+        if self.count - self.live > max(32, self.count // 2):
+            self._compact()
+        n = self.count
+        if n == 0:
+            return
+        x, y, w, h = self.x[:n], self.y[:n], self.w[:n], self.h[:n]
+        direction, alive = self.direction[:n], self.alive[:n]
+
+        cs = CELL_SIZE
+        old_cells = np.stack((x // cs, y // cs, (x + w - 1) // cs, (y + h - 1) // cs))
+
+        # Mismo movimiento que Enemy.update, para toda la formación
+        x += self.speed[:n] * direction
+        bounce = (x + w >= WIDTH) | (x <= 0)
+        direction[bounce] *= -1
+        y[bounce] += 30
+
+        new_cells = np.stack((x // cs, y // cs, (x + w - 1) // cs, (y + h - 1) // cs))
+        rehashed = (old_cells != new_cells).any(axis=0)
+        culled = alive & (y > HEIGHT)
+
+        sprites = self.sprites
+        xs, ys = x.tolist(), y.tolist()
+        for i in np.flatnonzero(alive & ~culled).tolist():
+            sprite = sprites[i]
+            rect = sprite.rect
+            rect.x = xs[i]
+            rect.y = ys[i]
+            sprite.dirty = 1
+        for i in np.flatnonzero(alive & ~culled & rehashed).tolist():
+            rehash(sprites[i])
+
+        # Enemigos que ya salieron por abajo: nunca vuelven a la pantalla
+        for i in np.flatnonzero(culled).tolist():
+            sprites[i].kill()
+            self.culled += 1
+
+# ===================== PERFILADOR ========================
+
+PHASES = ('events', 'spawn', 'update', 'collisions', 'rules', 'draw', 'flip')
+
+class RollingHistogram:
+    # Histograma de las últimas `window` muestras en cubetas de bin_us microsegundos;
+    # la última cubeta acumula todo lo que pase de bins * bin_us
+    def __init__(self, window=600, bin_us=100, bins=500):
+        self.bin_us = bin_us
+        self.counts = [0] * (bins + 1)
+        self.recent = deque(maxlen=window)
+
+    def add(self, ns):
+        b = min(ns // (self.bin_us * 1000), len(self.counts) - 1)
+        if len(self.recent) == self.recent.maxlen:
+            self.counts[self.recent[0]] -= 1
+        self.recent.append(b)
+        self.counts[b] += 1
+
+    def percentile(self, q):
+        # Devuelve milisegundos (límite superior de la cubeta)
+        target = q * len(self.recent)
+        seen = 0
+        for b, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return (b + 1) * self.bin_us / 1000
+        return 0.0
+
+class NullProfiler:
+    enabled = False
+
+    def begin_frame(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def end_frame(self, game):
+        pass
+
+class FrameProfiler:
+    # Mide cada fase del bucle con perf_counter_ns y guarda conteos de sprites por grupo
+    enabled = True
+
+    def __init__(self, window=600, trace=False):
+        self.histograms = {phase: RollingHistogram(window) for phase in PHASES + ('frame',)}
+        self.current = dict.fromkeys(PHASES, 0)
+        self.counts = {}
+        self.frames = 0
+        self.trace = [] if trace else None
+        self._start = self._last = 0
+
+    def begin_frame(self):
+        for phase in PHASES:
+            self.current[phase] = 0
+        self._start = self._last = time.perf_counter_ns()
+
+    def lap(self, phase):
+        now = time.perf_counter_ns()
+        self.current[phase] += now - self._last
+        self._last = now
+
+    def end_frame(self, game):
+        total = time.perf_counter_ns() - self._start
+        histograms = self.histograms
+        for phase, ns in self.current.items():
+            histograms[phase].add(ns)
+        histograms['frame'].add(total)
+        self.counts = game.group_counts()
+        self.frames += 1
+        if self.trace is not None:
+            row = {'frame': game.frame, 'total_us': total // 1000}
+            for phase, ns in self.current.items():
+                row[phase + '_us'] = ns // 1000
+            row.update(self.counts)
+            self.trace.append(row)
+
+    def p50(self, phase='frame'):
+        return self.histograms[phase].percentile(0.5)
+
+    def p99(self, phase='frame'):
+        return self.histograms[phase].percentile(0.99)
+
+    def summary_lines(self):
+        return [f"Frame p50 {self.p50():.1f} ms  p99 {self.p99():.1f} ms",
+                "p99 " + "  ".join(f"{phase} {self.p99(phase):.1f}" for phase in PHASES),
+                "  ".join(f"{name} {count}" for name, count in self.counts.items())]
+
+    def export(self, path):
+        # CSV o JSON según la extensión del archivo
+        rows = self.trace or []
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump(rows, f)
+        else:
+            with open(path, 'w', newline='') as f:
+                if rows:
+                    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                    writer.writerows(rows)
+        print(f"Traza de {len(rows)} frames guardada en {path}")
+
+# ===================== CICLO DE VIDA DE ENTIDADES ========================
+
+WAVE_ROWS, WAVE_COLS = 3, 8
+WAVE_SIZE = WAVE_ROWS * WAVE_COLS
+PLAYFIELD_MARGIN = 64  # los fantasmas nacen en y = -50, justo fuera de la pantalla
+
+# Máximo de entidades vivas por tipo (None = sin límite)
+DEFAULT_BUDGETS = {'enemies': 10 * WAVE_SIZE, 'ghosts': 8, 'bullets': 120, 'powers': 4,
+                   'particles': 300}
+
+# Qué hacer con una oleada nueva si no cabe en el presupuesto de enemigos:
+#   drop  - se descarta
+#   queue - espera hasta que haya lugar para la oleada completa
+#   merge - se crean solo los enemigos que caben, en el orden normal de la formación
+WAVE_POLICIES = ('drop', 'queue', 'merge')
+
+class EntityManager:
+    def __init__(self, game, budgets=None, wave_policy='queue'):
+        if wave_policy not in WAVE_POLICIES:
+            raise ValueError(f"política de oleadas desconocida: {wave_policy}")
+        self.game = game
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(budgets or {})
+        if wave_policy == 'queue' and self.budgets['enemies'] < WAVE_SIZE:
+            # Nunca habría lugar para una oleada completa: la cola crecería sin fin
+            raise ValueError(f"con la política 'queue' el presupuesto de enemigos debe ser "
+                             f"al menos {WAVE_SIZE} (una oleada)")
+        self.wave_policy = wave_policy
+        self.pending_waves = 0
+        self.peaks = dict.fromkeys(self.budgets, 0)
+        self.culled = dict.fromkeys(self.budgets, 0)
+        self.dropped = dict.fromkeys(self.budgets, 0)
+        self.playfield = pygame.Rect(-PLAYFIELD_MARGIN, -PLAYFIELD_MARGIN,
+                                     WIDTH + 2 * PLAYFIELD_MARGIN, HEIGHT + 2 * PLAYFIELD_MARGIN)
+
+    def live(self, kind):
+        return len(getattr(self.game, kind))
+
+    def room(self, kind):
+        budget = self.budgets.get(kind)
+        return float('inf') if budget is None else max(budget - self.live(kind), 0)
+
+    def admit(self, kind):
+        # True si una entidad más de este tipo entra en el presupuesto
+        if self.room(kind) >= 1:
+            return True
+        self.dropped[kind] += 1
+        return False
+
+    def request_wave(self):
+        room = self.room('enemies')
+        if room >= WAVE_SIZE:
+            self.game.spawn_enemies()
+        elif self.wave_policy == 'queue':
+            self.pending_waves += 1
+        elif self.wave_policy == 'merge':
+            self.game.spawn_enemies(room)
+            self.dropped['enemies'] += WAVE_SIZE - room
+        else:
+            self.dropped['enemies'] += WAVE_SIZE
+
+    def clear(self):
+        self.pending_waves = 0
+
+    def cull(self):
+        # Solo se revisan los cubos del hash espacial que caen fuera del área de juego
+        cs = CELL_SIZE
+        low = -(PLAYFIELD_MARGIN // cs)
+        max_cx = (WIDTH + PLAYFIELD_MARGIN) // cs - 1
+        max_cy = (HEIGHT + PLAYFIELD_MARGIN) // cs - 1
+        for kind in ('enemies', 'ghosts', 'bullets', 'powers'):
+            group = getattr(self.game, kind)
+            outside = {}
+            for (cx, cy), bucket in group.spatial.cells.items():
+                if cx < low or cy < low or cx > max_cx or cy > max_cy:
+                    outside.update(bucket)
+            for sprite in outside:
+                if not self.playfield.colliderect(sprite.rect):
+                    sprite.kill()
+                    self.culled[kind] += 1
+
+    def update(self):
+        self.cull()
+        while self.pending_waves and self.room('enemies') >= WAVE_SIZE:
+            self.pending_waves -= 1
+            self.game.spawn_enemies()
+        for kind in self.peaks:
+            live = self.live(kind)
+            if live > self.peaks[kind]:
+                self.peaks[kind] = live
+
+    def stats(self):
+        return {kind: {'live': self.live(kind), 'peak': self.peaks[kind], 'budget': self.budgets[kind],
+                       'culled': self.culled[kind], 'dropped': self.dropped[kind]}
+                for kind in self.budgets}
+
+# ===================== JUEGO ========================
+
+class Game:
+    def __init__(self, seed=None, clock=None, layered=False, numpy_enemies=False, profiler=None,
+                 budgets=None, wave_policy='queue'):
+        # Con semilla y SimClock la simulación es idéntica en cada ejecución
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.clock = clock if clock is not None else SimClock()
+        self.frame = 0
+        self.profiler = profiler if profiler is not None else NullProfiler()
+
+        # LayeredDirty solo hace falta con el renderizador por rectángulos sucios
+        self.all_sprites = pygame.sprite.LayeredDirty() if layered else pygame.sprite.Group()
+        self.enemies = HashedGroup()
+        self.ghosts = HashedGroup()
+        self.bullets = HashedGroup()
+        self.powers = HashedGroup()
+        self.boss_group = pygame.sprite.Group()
+
+        # Los sprites de vida corta salen de pools; el orden de los grupos es el de antes
+        self.bullet_pool = SpritePool(Bullet, self.all_sprites, self.bullets)
+        self.ghost_pool = SpritePool(Ghost, self.ghosts, self.all_sprites)
+        self.power_pool = SpritePool(PowerUp, self.powers, self.all_sprites)
+
+        self.enemy_store = None
+        if numpy_enemies:
+            if np is None:
+                print("⚠️ NumPy no está instalado. Usaré la actualización por sprite.")
+            else:
+                self.enemy_store = EnemyStore()
+
+        self.particles = ParticleSystem()
+        self.lifecycle = EntityManager(self, budgets, wave_policy)
+
+        # Temporizadores por tiempo de juego y umbrales de puntaje: nada se sondea por frame
+        self.timers = Scheduler()
+        self.milestones = Scheduler()
+
+        self.player = Player()
+        self.all_sprites.add(self.player)
+        # También la primera oleada pasa por el presupuesto de enemigos
+        self.lifecycle.request_wave()
+
+        self.timers.call_at(0, self.spawn_ghost)
+        self.timers.call_at(0, self.spawn_power)
+        self.score_checkpoint = 0
+        self.schedule_milestones()
+        self.game_over = False
+
+    def spawn_enemies(self, count=WAVE_SIZE):
+        for i in range(count):
+            row, col = divmod(i, WAVE_COLS)
             enemy = Enemy(100 + col * 70, 50 + row * 60, row)
-            all_sprites.add(enemy)
-            enemies.add(enemy)
-
-spawn_enemies()
-
-# ===================== VARIABLES DE JUEGO ========================
-
-spawn_ghost_timer = 0
-spawn_power_timer = 0
-score_checkpoint = 0
-game_over = False
-
-# ===================== BUCLE PRINCIPAL ========================
-
-running = True
-while running:
-    clock.tick(60)
-    current_time = pygame.time.get_ticks()
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE and not game_over:
-                for i in range(player.power_level):
-                    offset = (i - player.power_level // 2) * 15
-                    bullet = Bullet(player.rect.centerx + offset, player.rect.top, -10)
-                    all_sprites.add(bullet)
-                    bullets.add(bullet)
-
-            if event.key == pygame.K_r and game_over:
-                # Reiniciar todo
-                player.lives = 3
-                player.score = 0
-                player.power_level = 1
-                player.invincible = False
-                player.rect.centerx = WIDTH // 2
-                enemies.empty()
-                ghosts.empty()
-                bullets.empty()
-                powers.empty()
-                boss_group.empty()
-                explosions.empty()
-                all_sprites.empty()
-                all_sprites.add(player)
-                spawn_enemies()
-                game_over = False
-                score_checkpoint = 0
-
-    if not game_over:
-        # =================== Aparición de fantasmas ===================
-        if current_time > spawn_ghost_timer:
-            ghost = Ghost()
-            ghosts.add(ghost)
-            all_sprites.add(ghost)
-            spawn_ghost_timer = current_time + random.randint(2000, 4000)
-
-        # =================== Aparición de poderes ===================
-        if current_time > spawn_power_timer:
-            x = random.randint(50, WIDTH - 50)
-            power = PowerUp((x, 0))
-            powers.add(power)
-            all_sprites.add(power)
-            spawn_power_timer = current_time + random.randint(7000, 12000)
+            self.all_sprites.add(enemy)
+            self.enemies.add(enemy)
+            if self.enemy_store is not None:
+                self.enemy_store.add(enemy)
+
+    def spawn_ghost(self, now):
+        if self.lifecycle.admit('ghosts'):
+            self.ghost_pool.acquire(self.rng)
+        self.timers.call_at(now + self.rng.randint(2000, 4000), self.spawn_ghost)
+
+    def spawn_power(self, now):
+        x = self.rng.randint(50, WIDTH - 50)
+        if self.lifecycle.admit('powers'):
+            self.power_pool.acquire((x, 0), self.rng)
+        self.timers.call_at(now + self.rng.randint(7000, 12000), self.spawn_power)
+
+    def make_invincible(self, now, duration):
+        # Un nuevo escudo reemplaza el plazo anterior, aunque fuera más largo
+        player = self.player
+        if player.invincible_timer is not None:
+            player.invincible_timer.cancel()
+        player.invincible = True
+        player.invincible_timer = self.timers.call_at(now + duration, self.end_invincibility)
+
+    def end_invincibility(self, now):
+        self.player.invincible = False
+        self.player.invincible_timer = None
+
+    def power_up(self, now, duration):
+        player = self.player
+        if player.power_timer is not None:
+            player.power_timer.cancel()
+        player.power_level = min(player.power_level + 1, 3)
+        player.power_timer = self.timers.call_at(now + duration, self.end_power)
+
+    def end_power(self, now):
+        self.player.power_level = 1
+        self.player.power_timer = None
+
+    def schedule_milestones(self):
+        self.milestones.call_at(self.score_checkpoint + 500, self.next_wave)
+        self.milestones.call_at(1000, self.boss_milestone)
+
+    def next_wave(self, score):
+        # Dificultad progresiva: una oleada cada 500 puntos
+        self.lifecycle.request_wave()
+        self.score_checkpoint += 500
+        self.milestones.call_at(self.score_checkpoint + 500, self.next_wave)
+
+    def boss_milestone(self, score):
+        # Un jefe al llegar a cada múltiplo de 1000, si no hay otro en pantalla
+        if not self.boss_group:
+            boss = Boss()
+            self.boss_group.add(boss)
+            self.all_sprites.add(boss)
+        self.milestones.call_at((score // 1000 + 1) * 1000, self.boss_milestone)
+
+    def add_explosion(self, center, now):
+        if self.lifecycle.admit('particles'):
+            self.particles.spawn(center, now)
+
+    def fire(self):
+        player = self.player
+        for i in range(player.power_level):
+            if not self.lifecycle.admit('bullets'):
+                break
+            offset = (i - player.power_level // 2) * 15
+            self.bullet_pool.acquire(player.rect.centerx + offset, player.rect.top, -10)
+
+    def restart(self):
+        # Reiniciar todo
+        player = self.player
+        player.lives = 3
+        player.score = 0
+        for timer in (player.power_timer, player.invincible_timer):
+            if timer is not None:
+                timer.cancel()
+        player.power_level = 1
+        player.power_timer = None
+        player.invincible = False
+        player.invincible_timer = None
+        player.rect.centerx = WIDTH // 2
+        # kill() en vez de empty() para no sacar del grupo de dibujo al jugador ni al HUD
+        for group in (self.enemies, self.ghosts, self.bullets, self.powers,
+                      self.boss_group):
+            for sprite in group.sprites():
+                sprite.kill()
+        self.particles.clear()
+        self.lifecycle.clear()
+        self.lifecycle.request_wave()
+        self.game_over = False
+        self.score_checkpoint = 0
+        self.milestones.clear()
+        self.schedule_milestones()
+        # Las apariciones siguen donde quedaron al perder
+        self.timers.resume(self.clock.get_ticks())
+
+    def step(self, controls=NO_INPUT):
+        self.clock.advance()
+        current_time = self.clock.get_ticks()
+        self.frame += 1
+        player = self.player
+        player.controls = controls
+
+        if controls.fire and not self.game_over:
+            self.fire()
+        if controls.restart and self.game_over:
+            self.restart()
+
+        collision_stats.reset()
+        prof = self.profiler
+        prof.lap('events')
+
+        if self.game_over:
+            return
+
+        # =================== Temporizadores vencidos ===================
+        # Aparición de fantasmas y poderes, fin de la invencibilidad y del disparo múltiple
+        self.timers.run(current_time)
+        prof.lap('spawn')
 
         # =================== Actualizar todo ===================
-        all_sprites.update()
+        self.all_sprites.update(current_time)
+        self.particles.update(current_time)
+        if self.enemy_store is not None:
+            self.enemy_store.step()
+        prof.lap('update')
 
         # =================== Colisiones balas-enemigos ===================
-        hits = pygame.sprite.groupcollide(enemies, bullets, True, True)
+        hits = groupcollide(self.enemies, self.bullets, True, True)
         for hit in hits:
             player.score += 100
-            explosion = Explosion(hit.rect.center)
-            all_sprites.add(explosion)
-            explosions.add(explosion)
+            self.add_explosion(hit.rect.center, current_time)
 
         # =================== Colisiones balas-jefe ===================
-        for boss in boss_group:
-            if pygame.sprite.spritecollide(boss, bullets, True):
+        for boss in self.boss_group:
+            if spritecollide(boss, self.bullets, True):
                 boss.health -= 1
                 if boss.health <= 0:
                     boss.kill()
                     player.score += 500
-                    explosion = Explosion(boss.rect.center)
-                    all_sprites.add(explosion)
-                    explosions.add(explosion)
+                    self.add_explosion(boss.rect.center, current_time)
 
         # =================== Colisiones jugador-enemigos ===================
         if not player.invincible:
-            if pygame.sprite.spritecollide(player, enemies, True) or pygame.sprite.spritecollide(player, ghosts, True):
+            if spritecollide(player, self.enemies, True) or spritecollide(player, self.ghosts, True):
                 player.lives -= 1
-                player.invincible = True
-                player.invincible_timer = current_time + 2000
+                self.make_invincible(current_time, 2000)
                 if player.lives <= 0:
-                    game_over = True
+                    self.game_over = True
+                    self.timers.pause(current_time)
 
         # =================== Colisiones jugador-powerups ===================
-        hits = pygame.sprite.spritecollide(player, powers, True)
+        hits = spritecollide(player, self.powers, True)
         for hit in hits:
             if hit.type == 'x2':
-                player.power_level = min(player.power_level + 1, 3)
-                player.power_timer = current_time + 10000
+                self.power_up(current_time, 10000)
             elif hit.type == 'shield':
-                player.invincible = True
-                player.invincible_timer = current_time + 5000
+                self.make_invincible(current_time, 5000)
             elif hit.type == 'life':
                 player.lives = min(player.lives + 1, 5)
             elif hit.type == 'bomb':
-                for e in enemies:
+                for e in self.enemies:
                     e.kill()
-                    explosion = Explosion(e.rect.center)
-                    all_sprites.add(explosion)
-                    explosions.add(explosion)
-                for g in ghosts:
+                    self.add_explosion(e.rect.center, current_time)
+                for g in self.ghosts:
                     g.kill()
-                    explosion = Explosion(g.rect.center)
-                    all_sprites.add(explosion)
-                    explosions.add(explosion)
+                    self.add_explosion(g.rect.center, current_time)
+        prof.lap('collisions')
 
-        # =================== Dificultad progresiva ===================
-        if player.score >= score_checkpoint + 500:
-            spawn_enemies()
-            score_checkpoint += 500
+        # =================== Dificultad progresiva y jefe ===================
+        self.milestones.run(player.score)
 
-        # =================== Jefe ===================
-        if player.score > 0 and player.score % 1000 == 0 and len(boss_group) == 0:
-            boss = Boss()
-            boss_group.add(boss)
-            all_sprites.add(boss)
+        # =================== Presupuestos y limpieza ===================
+        self.lifecycle.update()
+        prof.lap('rules')
+
+    def state_digest(self):
+        # Resumen compacto del estado para comparar corridas deterministas
+        return (self.frame, self.player.score, self.player.lives, self.player.rect.x,
+                len(self.enemies), len(self.ghosts), len(self.bullets), len(self.powers),
+                len(self.boss_group))
+
+    def group_counts(self):
+        return {'sprites': len(self.all_sprites), 'enemies': len(self.enemies),
+                'ghosts': len(self.ghosts), 'bullets': len(self.bullets),
+                'powers': len(self.powers), 'boss': len(self.boss_group),
+                'particles': len(self.particles)}
 
-    # =================== Dibujar ===================
-    screen.blit(background, (0, 0))
-    all_sprites.draw(screen)
+    def pool_stats(self):
+        return {'bullets': self.bullet_pool.stats(),
+                'ghosts': self.ghost_pool.stats(), 'powers': self.power_pool.stats()}
+
+# ===================== DIBUJO ========================
+
+HUD_LAYER = 10
+_fonts = {}
+
+def get_font(size):
+    # pygame.font.Font(None, size) es caro; se crea una sola vez por tamaño
+    font = _fonts.get(size)
+    if font is None:
+        font = _fonts[size] = pygame.font.Font(None, size)
+    return font
+
+class HudText(pygame.sprite.DirtySprite):
+    # Texto del HUD que solo se vuelve a renderizar cuando cambia su contenido
+    def __init__(self, size, color, pos=(0, 0)):
+        super().__init__()
+        self.font = get_font(size)
+        self.color = color
+        self.text = None
+        self.image = pygame.Surface((0, 0), pygame.SRCALPHA)
+        self.rect = self.image.get_rect(topleft=pos)
+
+    def set_text(self, text):
+        if text != self.text:
+            self.text = text
+            topleft = self.rect.topleft
+            self.image = self.font.render(text, True, self.color)
+            self.rect = self.image.get_rect(topleft=topleft)
+            self.dirty = 1
+
+    def center_x(self, y):
+        pos = (WIDTH//2 - self.rect.width//2, y)
+        if self.rect.topleft != pos:
+            self.rect.topleft = pos
+            self.dirty = 1
+
+    def show(self, visible):
+        if self.visible != visible:
+            self.visible = visible
+
+class Hud:
+    def __init__(self):
+        self.score = HudText(36, (255, 255, 255), (10, 10))
+        self.stats = HudText(36, (255, 255, 0), (10, 40))
+        self.over = HudText(72, (255, 0, 0))
+        self.restart = HudText(36, (255, 255, 255))
+        self.over.set_text("GAME OVER")
+        self.restart.set_text("Presiona R para reiniciar")
+        self.over.center_x(HEIGHT//2 - 50)
+        self.restart.center_x(HEIGHT//2 + 20)
+        self.profile = [HudText(22, (0, 255, 0), (10, HEIGHT - 66 + 18 * i)) for i in range(3)]
+        self.items = [self.score, self.stats, self.over, self.restart] + self.profile
+
+    def refresh(self, game, show_stats, show_profile=False, skipped=0):
+        player = game.player
+        self.score.set_text(f"Score: {player.score}  Lives: {player.lives}  Power: x{player.power_level}")
+        self.stats.show(show_stats)
+        if show_stats:
+            self.stats.set_text(f"Pruebas: {collision_stats.tests}  Evitadas: {collision_stats.skipped}"
+                                f"  Saltados: {skipped}")
+        self.over.show(game.game_over)
+        self.restart.show(game.game_over)
+
+        # El texto del perfilador se actualiza cada 15 frames para poder leerlo
+        prof = game.profiler
+        show_profile = show_profile and prof.enabled
+        for item in self.profile:
+            item.show(show_profile)
+        if show_profile and prof.frames % 15 == 0:
+            for item, line in zip(self.profile, prof.summary_lines()):
+                item.set_text(line)
+
+def snapshot_positions(game):
+    return {sprite: sprite.rect.topleft for sprite in game.all_sprites}
+
+def interpolate(sprite, previous, alpha):
+    # Posición de dibujo entre el paso anterior y el actual; los saltos grandes
+    # (sprites reciclados, reinicios) se dibujan directamente en la posición nueva
+    x, y = sprite.rect.topleft
+    old = previous.get(sprite)
+    if old is None or abs(x - old[0]) > 64 or abs(y - old[1]) > 64:
+        return x, y
+    return round(old[0] + (x - old[0]) * alpha), round(old[1] + (y - old[1]) * alpha)
+
+class FullRenderer:
+    # Repinta toda la pantalla cada frame
+    def __init__(self, screen, game):
+        self.screen = screen
+        self.hud = Hud()
+
+    def draw(self, game, show_stats=False, show_profile=False, skipped=0, previous=None, alpha=1.0):
+        screen = self.screen
+        screen.blit(background, (0, 0))
+        if previous is None:
+            game.all_sprites.draw(screen)
+        else:
+            screen.blits([(sprite.image, interpolate(sprite, previous, alpha))
+                          for sprite in game.all_sprites], False)
+        game.particles.draw(screen)
+
+        self.hud.refresh(game, show_stats, show_profile, skipped)
+        for item in self.hud.items:
+            if item.visible:
+                screen.blit(item.image, item.rect)
+
+    def present(self):
+        pygame.display.flip()
+
+class DirtyRenderer:
+    # Solo repinta los rectángulos que cambiaron (sprites marcados dirty y posiciones anteriores)
+    def __init__(self, screen, game):
+        self.screen = screen
+        self.hud = Hud()
+        self.particle_rects = []
+        self.update_rects = []
+        for item in self.hud.items:
+            game.all_sprites.add(item, layer=HUD_LAYER)
+        game.all_sprites.clear(screen, background)
+        screen.blit(background, (0, 0))
+        pygame.display.flip()
+
+    def draw(self, game, show_stats=False, show_profile=False, skipped=0, previous=None, alpha=1.0):
+        # Sin interpolación: el seguimiento de rectángulos sucios se basa en sprite.rect
+        self.hud.refresh(game, show_stats, show_profile, skipped)
+        # Las explosiones no son sprites: su área del frame anterior se repinta a mano
+        for rect in self.particle_rects:
+            game.all_sprites.repaint_rect(rect)
+        rects = game.all_sprites.draw(self.screen)
+        self.particle_rects = game.particles.draw(self.screen)
+        self.update_rects = rects + self.particle_rects
+
+    def present(self):
+        pygame.display.update(self.update_rects)
+
+class TextureAtlas:
+    # Varias imágenes copiadas en una sola superficie. Se empaquetan por estantes:
+    # de la más alta a la más baja, de izquierda a derecha, con una fila nueva
+    # cuando ya no caben. `regions` va de la imagen original a su área en el atlas.
+    # Las columnas y el ancho total se alinean a `align` píxeles: SDL solo usa su
+    # blitter SIMD si cada fila de origen empieza alineada (sin eso, el doble de lento).
+    def __init__(self, images, max_width=512, padding=1, align=4):
+        # images: pares (clave, imagen); la clave suele ser la misma imagen, pero
+        # permite guardar otra versión de los píxeles (p. ej. con el alfa ya aplicado)
+        order = sorted(images, key=lambda item: item[1].get_height(), reverse=True)
+        self.regions = {}
+        x = y = shelf = width = 0
+        placed = []
+        for key, image in order:
+            w, h = image.get_size()
+            if x and x + w > max_width:
+                x, y, shelf = 0, y + shelf + padding, 0
+            rect = pygame.Rect(x, y, w, h)
+            placed.append((image, rect))
+            self.regions[key] = rect
+            x = -(-(x + w + padding) // align) * align
+            shelf = max(shelf, h)
+            width = max(width, x)
+        self.surface = pygame.Surface((max(width, align), max(y + shelf, 1)), pygame.SRCALPHA)
+        for image, rect in placed:
+            # BLEND_RGBA_MAX sobre un fondo transparente copia los píxeles tal cual,
+            # sin mezclarlos con el negro del atlas
+            self.surface.blit(image, rect, special_flags=pygame.BLEND_RGBA_MAX)
+
+def _bake_alpha(frame):
+    # El alfa de superficie no viaja al atlas: se multiplica en el alfa de cada píxel
+    alpha = frame.get_alpha()
+    baked = frame.copy()
+    baked.set_alpha(255)  # con None, fill() ignora los modos de mezcla en superficies SRCALPHA
+    if alpha is not None and alpha < 255:
+        baked.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
+    return baked
+
+def _make_sprite_atlas():
+    images = [player_img, *enemy_imgs, bullet_img, power_img, boss_image()]
+    items = [(image, image) for image in images]
+    items += [(frame, _bake_alpha(frame)) for frame in explosion_frames()]
+    return TextureAtlas(items)
+
+def sprite_atlas():
+    return derived('atlas', _make_sprite_atlas)
+
+class AtlasRenderer:
+    # Repinta toda la pantalla como FullRenderer, pero sprites (en orden de capa),
+    # explosiones y HUD salen de un solo Surface.blits con áreas del atlas
+    def __init__(self, screen, game):
+        self.screen = screen
+        self.hud = Hud()
+        self.atlas = sprite_atlas()
+
+    def draw(self, game, show_stats=False, show_profile=False, skipped=0, previous=None, alpha=1.0):
+        screen = self.screen
+        atlas = self.atlas.surface
+        regions = self.atlas.regions
+        screen.blit(background, (0, 0))
+
+        # LayeredDirty ya itera por capa; un Group simple tiene todo en la capa 0
+        sprites = game.all_sprites
+        if previous is None:
+            batch = [(atlas, sprite.rect, regions[sprite.image]) if sprite.image in regions
+                     else (sprite.image, sprite.rect) for sprite in sprites]
+        else:
+            batch = [(atlas, interpolate(sprite, previous, alpha), regions[sprite.image])
+                     if sprite.image in regions
+                     else (sprite.image, interpolate(sprite, previous, alpha)) for sprite in sprites]
+        for frame, pos in game.particles.placements():
+            batch.append((atlas, pos, regions[frame]))
+
+        self.hud.refresh(game, show_stats, show_profile, skipped)
+        for item in self.hud.items:
+            if item.visible:
+                batch.append((item.image, item.rect))
+        screen.blits(batch, False)
+
+    def present(self):
+        pygame.display.flip()
+
+RENDERERS = {'full': FullRenderer, 'dirty': DirtyRenderer, 'atlas': AtlasRenderer}
+
+# ===================== GRABACIÓN Y REPETICIÓN ========================
+
+# Archivo: cabecera + un byte de entrada por frame comprimido con zlib + pie JSON con
+# el estado final y las opciones de Game (versión 1: el pie era solo el estado final)
+REPLAY_MAGIC = b'NREC'
+REPLAY_VERSION = 2
+REPLAY_HEADER = struct.Struct('<4sHBQII')  # magia, versión, flags, semilla, frames, bytes comprimidos
+REPLAY_NUMPY = 1  # flag: la partida usó el almacén NumPy de enemigos
+
+def pack_input(controls):
+    return controls.left | controls.right << 1 | controls.fire << 2 | controls.restart << 3
+
+# Las 16 combinaciones posibles, para no crear un FrameInput por frame al repetir
+INPUT_TABLE = [FrameInput(bool(b & 1), bool(b & 2), bool(b & 4), bool(b & 8)) for b in range(16)]
+
+Recording = namedtuple('Recording', ['seed', 'options', 'inputs', 'digest'])
+
+class InputRecorder:
+    def __init__(self, seed, options=None):
+        self.seed = seed
+        self.options = dict(options or {})
+        self.inputs = bytearray()
+
+    def record(self, controls):
+        self.inputs.append(pack_input(controls))
+
+    def save(self, path, game):
+        body = zlib.compress(bytes(self.inputs), 9)
+        flags = REPLAY_NUMPY if self.options.get('numpy_enemies') else 0
+        # Todo se empaqueta antes de abrir el archivo: un error no deja una grabación truncada
+        header = REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, flags, self.seed,
+                                    len(self.inputs), len(body))
+        footer = json.dumps({'digest': game.state_digest(), 'options': self.options}).encode()
+        with open(path, 'wb') as f:
+            f.write(header + body + footer)
+        print(f"Grabación de {len(self.inputs)} frames guardada en {path} ({REPLAY_HEADER.size + len(body)} bytes)")
+
+def load_recording(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, flags, seed, frames, body_len = REPLAY_HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or version not in (1, REPLAY_VERSION):
+        raise ValueError(f"{path} no es una grabación de SpaceMax Defender compatible")
+    start = REPLAY_HEADER.size
+    inputs = zlib.decompress(data[start:start + body_len])
+    if len(inputs) != frames:
+        raise ValueError(f"{path} está incompleto: {len(inputs)} de {frames} frames")
+    footer = json.loads(data[start + body_len:]) if len(data) > start + body_len else None
+    options = {'numpy_enemies': bool(flags & REPLAY_NUMPY)}
+    digest = footer
+    if version >= 2 and footer is not None:
+        options.update(footer['options'])
+        digest = footer['digest']
+    return Recording(seed, options, inputs, digest)
+
+# ===================== BUCLES PRINCIPALES ========================
+
+def run_window(seed=None, renderer='full', game_options=None, trace_path=None, record_path=None):
+    game_options = game_options or {}
+    dirty = renderer == 'dirty'
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("SpaceMax Defender: Power Edition")
+    load_assets()
+
+    clock = pygame.time.Clock()
+    profiler = FrameProfiler(trace=trace_path is not None)
+    recorder = None
+    if record_path:
+        # Para poder repetirla, la partida grabada usa semilla fija
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        recorder = InputRecorder(seed, game_options)
+    # El tiempo del juego avanza STEP_MS por paso de lógica, no con el reloj de pared
+    game = Game(seed=seed, clock=SimClock(), layered=dirty, profiler=profiler, **game_options)
+    renderer = RENDERERS[renderer](screen, game)
+    show_stats = False  # F3 muestra el contador de pruebas de colisión (y frames saltados)
+    show_profile = False  # F4 muestra los tiempos por fase
+
+    accumulator = 0.0
+    last = time.perf_counter()
+    fire = restart = False  # pulsaciones pendientes hasta que las consuma un paso de lógica
+    steps_total = rendered = skipped = 0
+    previous = None
+
+    running = True
+    while running:
+        clock.tick(FPS)
+        profiler.begin_frame()
+        now = time.perf_counter()
+        accumulator += (now - last) * 1000
+        last = now
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    fire = True
+                if event.key == pygame.K_r:
+                    restart = True
+                if event.key == pygame.K_F3:
+                    show_stats = not show_stats
+                if event.key == pygame.K_F4:
+                    show_profile = not show_profile
+        keys = pygame.key.get_pressed()
+
+        # Lógica a paso fijo: tantos pasos como tiempo acumulado, con un tope por frame
+        steps = min(int(accumulator // STEP_MS), MAX_STEPS_PER_FRAME)
+        for i in range(steps):
+            controls = FrameInput(keys[pygame.K_LEFT], keys[pygame.K_RIGHT], fire, restart)
+            fire = restart = False
+            if recorder:
+                recorder.record(controls)
+            if not dirty and i == steps - 1:
+                previous = snapshot_positions(game)  # estado anterior al último paso, para interpolar
+            game.step(controls)
+        accumulator -= steps * STEP_MS
+        if steps == MAX_STEPS_PER_FRAME:
+            accumulator = min(accumulator, STEP_MS)  # se descarta el atraso que no se alcanza
+        steps_total += steps
+        skipped += max(steps - 1, 0)  # pasos de lógica que nunca se dibujaron
+
+        renderer.draw(game, show_stats, show_profile, skipped, previous, accumulator / STEP_MS)
+        profiler.lap('draw')
+        renderer.present()
+        profiler.lap('flip')
+        profiler.end_frame(game)
+        rendered += 1
+
+    print(f"Pasos de lógica: {steps_total}  Frames dibujados: {rendered}  Saltados: {skipped}")
+    if recorder:
+        recorder.save(record_path, game)
+    if trace_path:
+        profiler.export(trace_path)
+    pygame.quit()
+
+def autopilot(game, rng):
+    # Piloto automático simple para simulaciones sin jugador: barre la pantalla y dispara
+    frame = game.frame
+    sweep = (frame // 90) % 2 == 0
+    return FrameInput(left=sweep, right=not sweep,
+                      fire=frame % 8 == 0 or rng.random() < 0.05,
+                      restart=game.game_over)
+
+def run_headless(frames, seed=0, game_options=None, trace_path=None, profile=False,
+                 record_path=None):
+    game_options = game_options or {}
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    load_assets(convert=False)
+
+    profiler = FrameProfiler(window=frames, trace=trace_path is not None) if profile or trace_path else None
+    game = Game(seed=seed, profiler=profiler, **game_options)
+    prof = game.profiler
+    recorder = InputRecorder(seed, game_options) if record_path else None
+    pilot_rng = random.Random(seed)
+    games_over = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        was_over = game.game_over
+        controls = autopilot(game, pilot_rng)
+        if recorder:
+            recorder.record(controls)
+        prof.begin_frame()
+        game.step(controls)
+        prof.end_frame(game)
+        if game.game_over and not was_over:
+            games_over += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"Frames: {frames}  Tiempo: {elapsed:.2f} s  ({frames / elapsed:.0f} frames/s)")
+    print(f"Partidas perdidas: {games_over}  Estado final: {game.state_digest()}")
+    for name, stats in game.pool_stats().items():
+        print(f"Pool {name}: {stats['hits']} reciclados, {stats['misses']} nuevos "
+              f"({stats['hit_rate']:.0%} aciertos)")
+    for kind, stats in game.lifecycle.stats().items():
+        print(f"{kind}: {stats['live']} vivos, pico {stats['peak']}/{stats['budget']}, "
+              f"{stats['culled']} fuera de pantalla, {stats['dropped']} descartados")
+    if profiler is not None:
+        for line in profiler.summary_lines():
+            print(line)
+    if recorder:
+        recorder.save(record_path, game)
+    if trace_path:
+        profiler.export(trace_path)
+    pygame.quit()
+    return game
+
+def run_replay(path, render=False, profile=False, trace_path=None):
+    # Repite una grabación sin límite de FPS; dibujar es opcional
+    recording = load_recording(path)
+    if not render:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    renderer = None
+    if render:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("SpaceMax Defender: repetición")
+        load_assets()
+    else:
+        load_assets(convert=False)
+
+    profiler = FrameProfiler(window=max(len(recording.inputs), 1), trace=trace_path is not None) \
+        if profile or trace_path else None
+    game = Game(seed=recording.seed, profiler=profiler, **recording.options)
+    prof = game.profiler
+    if render:
+        renderer = FullRenderer(screen, game)
+
+    start = time.perf_counter()
+    for b in recording.inputs:
+        prof.begin_frame()
+        game.step(INPUT_TABLE[b])
+        if renderer:
+            pygame.event.pump()
+            renderer.draw(game)
+            prof.lap('draw')
+            renderer.present()
+            prof.lap('flip')
+        prof.end_frame(game)
+    elapsed = time.perf_counter() - start
+
+    frames = len(recording.inputs)
+    print(f"Repetición de {frames} frames (semilla {recording.seed}): {elapsed:.2f} s "
+          f"({frames / max(elapsed, 1e-9):.0f} frames/s)")
+    digest = list(game.state_digest())
+    if recording.digest is not None:
+        if digest == recording.digest:
+            print(f"✅ Estado final idéntico al grabado: {tuple(digest)}")
+        else:
+            print(f"❌ El estado final difiere: grabado {tuple(recording.digest)}, repetido {tuple(digest)}")
+    if profiler is not None:
+        for line in profiler.summary_lines():
+            print(line)
+    if trace_path:
+        profiler.export(trace_path)
+    pygame.quit()
+    return game
 
-    # Texto
-    font = pygame.font.Font(None, 36)
-    text = font.render(f"Score: {player.score}  Lives: {player.lives}  Power: x{player.power_level}", True, (255, 255, 255))
-    screen.blit(text, (10, 10))
+def main():
+    parser = argparse.ArgumentParser(description="SpaceMax Defender: Power Edition")
+    parser.add_argument('--headless', action='store_true',
+                        help="simular sin ventana, con reloj simulado y sin límite de FPS")
+    parser.add_argument('--frames', type=int, default=10000, help="frames a simular en modo headless")
+    parser.add_argument('--dirty', action='store_true',
+                        help="repintar solo los rectángulos que cambiaron (equipos lentos)")
+    parser.add_argument('--atlas', action='store_true',
+                        help="dibujar los sprites desde un atlas de texturas con un solo blits")
+    parser.add_argument('--numpy', action='store_true',
+                        help="mover la formación de enemigos con arreglos NumPy")
+    parser.add_argument('--profile', action='store_true',
+                        help="medir el tiempo de cada fase (en modo headless imprime el resumen)")
+    parser.add_argument('--trace', metavar='ARCHIVO',
+                        help="guardar la traza por frame en CSV (o JSON si termina en .json)")
+    parser.add_argument('--record', metavar='ARCHIVO',
+                        help="grabar la entrada de cada frame y la semilla en un archivo binario")
+    parser.add_argument('--replay', metavar='ARCHIVO',
+                        help="repetir una grabación a máxima velocidad")
+    parser.add_argument('--render', action='store_true',
+                        help="con --replay: dibujar la repetición en una ventana")
+    parser.add_argument('--wave-policy', choices=WAVE_POLICIES, default='queue',
+                        help="qué hacer con una oleada que no cabe en el presupuesto de enemigos")
+    parser.add_argument('--budget', action='append', default=[], metavar='TIPO=N',
+                        help=f"límite de entidades vivas ({', '.join(DEFAULT_BUDGETS)}); repetible")
+    parser.add_argument('--seed', type=int, default=None, help="semilla del generador aleatorio")
+    args = parser.parse_args()
 
-    if game_over:
-        font_big = pygame.font.Font(None, 72)
-        over_text = font_big.render("GAME OVER", True, (255, 0, 0))
-        screen.blit(over_text, (WIDTH//2 - over_text.get_width()//2, HEIGHT//2 - 50))
-        restart_text = font.render("Presiona R para reiniciar", True, (255, 255, 255))
-        screen.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, HEIGHT//2 + 20))
+    if args.seed is not None and not 0 <= args.seed < 2 ** 64:
+        parser.error(f"semilla inválida: {args.seed} (debe estar entre 0 y 2**64 - 1)")
+    budgets = {}
+    for item in args.budget:
+        kind, _, value = item.partition('=')
+        if kind not in DEFAULT_BUDGETS or not value.isdigit():
+            parser.error(f"presupuesto inválido: {item}")
+        budgets[kind] = int(value)
+    if args.wave_policy == 'queue' and budgets.get('enemies', WAVE_SIZE) < WAVE_SIZE:
+        parser.error(f"con --wave-policy queue el presupuesto de enemigos debe ser al menos "
+                     f"{WAVE_SIZE} (una oleada); usa merge o drop para menos")
+    game_options = {'wave_policy': args.wave_policy}
+    if args.numpy:
+        game_options['numpy_enemies'] = True
+    if budgets:
+        game_options['budgets'] = budgets
 
-    pygame.display.flip()
+    if args.replay:
+        run_replay(args.replay, args.render, args.profile, args.trace)
+    elif args.headless:
+        run_headless(args.frames, 0 if args.seed is None else args.seed, game_options,
+                     args.trace, args.profile, args.record)
+    else:
+        renderer = 'dirty' if args.dirty else 'atlas' if args.atlas else 'full'
+        run_window(args.seed, renderer, game_options, args.trace, args.record)
 
-pygame.quit()
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,36 @@
 import tkinter as tk
+import argparse
+import csv
+import hashlib
+import json
 import math
+import os
+import struct
 import time
-import random
+from collections import Counter, OrderedDict, deque
+
+# NumPy es opcional: sin él, los sensores consultan el canvas con find_overlapping
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CANVAS_SIZE = (800, 600)
+DT = 0.03           # s simulados por paso: lo mismo que window.after(30)
+SENSOR_HALF = 5     # los sensores buscan ítems en un cuadrado de ±5 px
+SPLINE_STEPS = 12   # splinesteps por defecto de las líneas con smooth=True de Tk
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+TRAIL_CAPACITY = 400  # puntos de la estela (uno cada TRAIL_EVERY pasos)
+TRAIL_EVERY = 2
+MAX_PROGRESS_STEP = 60  # px por paso: cortar una curva por dentro salta ~30 px, otro tramo salta cientos
 
 class PIDController:
-    def __init__(self, Kp, Ki, Kd):
+    def __init__(self, Kp, Ki, Kd, smoothing=0.3, derivative_factor=0.7):
         self.Kp = Kp
         self.Ki = Ki
         self.Kd = Kd
+        self.smoothing = smoothing  # peso de la salida nueva frente a la anterior
+        self.derivative_factor = derivative_factor
         self.prev_error = 0
         self.integral = 0
         self.last_output = 0
@@ -16,109 +39,100 @@ class PIDController:
         if dt <= 0:
             derivative = 0
         else:
-            derivative = (error - self.prev_error) / dt * 0.7
+            derivative = (error - self.prev_error) / dt * self.derivative_factor
         self.integral = max(-50, min(self.integral + error * dt, 50))
         raw_output = self.Kp * error + self.Ki * self.integral + self.Kd * derivative
-        smoothed_output = 0.3 * raw_output + 0.7 * self.last_output
+        smoothed_output = self.smoothing * raw_output + (1 - self.smoothing) * self.last_output
         self.last_output = smoothed_output
         self.prev_error = error
         return smoothed_output
 
+# ===================== SIMULACIÓN ========================
+# El carro no sabe nada de Tk: avanza DT segundos simulados por paso y consulta
+# los sensores en un objeto con on_line(x, y) y on_stop_bar(x, y) (la pista con
+# máscaras, o CanvasSensors si no hay NumPy). Así puede correr sin ventana y
+# mucho más rápido que en tiempo real.
+
+# Ganancias y límites del controlador (ajustecarro.py busca mejores valores)
+DEFAULT_TUNING = {'Kp': 3, 'Ki': 0.00001, 'Kd': 0.00001, 'max_turn_rate': 3.0,
+                  'smoothing': 0.3, 'derivative_factor': 0.7}
+
 class LineFollowerCar:
-    def __init__(self, canvas):
-        self.canvas = canvas
-        self.car_x = 150
-        self.car_y = 500
-        self.car_angle = 270
+    def __init__(self, sensors, dt=DT, tuning=None, start=(150, 500, 270), size=CANVAS_SIZE,
+                 course=None):
+        unknown = set(tuning or {}) - set(DEFAULT_TUNING)
+        if unknown:
+            raise ValueError(f"parámetros de ajuste desconocidos: {', '.join(sorted(unknown))}")
+        tuning = {**DEFAULT_TUNING, **(tuning or {})}
+        self.sensors = sensors
+        self.dt = dt
+        self.size = size  # el carro no sale del mundo (a 20 px del borde)
+        self.car_x, self.car_y, self.car_angle = start
+        self.start_angle = self.car_angle
         self.speed = 1.5
         self.sensor_distance = 30
         self.sensor_offset = 20
-        self.pid = PIDController(3, 0.00001, 0.00001)
-        self.last_time = time.time()
-        self.trail = []
+        self.pid = PIDController(tuning['Kp'], tuning['Ki'], tuning['Kd'],
+                                 tuning['smoothing'], tuning['derivative_factor'])
+        self.sim_time = 0.0
+        self.steps = 0
         self.last_angle_change = 0
-        self.max_turn_rate = 3.0
+        self.max_turn_rate = tuning['max_turn_rate']
         self.stopping = False
+        self.state = 'none'
+        self.steering = 0.0
+        # Pista sobre la que se mide el avance (por defecto, los sensores si son una Track)
+        if course is None and isinstance(sensors, Track) and sensors.tiles is not None:
+            course = sensors
+        self.course = course
+        self.travelled = 0.0  # px avanzados sobre la pista desde la salida
+        self.cross_track = 0.0
+        self.progress = None
+        self._laps = 0
+        self.update_pose()
+        self.update_progress()
 
-        # Dibujar cuerpo, ruedas y sensores
-        self.body = self.create_car_body()
-        self.left_wheel = self.create_wheel()
-        self.right_wheel = self.create_wheel()
-        self.sensor_left = self.create_sensor()
-        self.sensor_right = self.create_sensor()
-        self.update_car()
-
-    def create_car_body(self):
-        return self.canvas.create_polygon([0,0,50,0,50,30,0,30], fill='#2E86C1', outline='#1B4F72', width=2)
-    def create_wheel(self):
-        return self.canvas.create_oval(0,0,12,12, fill='#2C3E50', outline='#1B2631')
-    def create_sensor(self):
-        return self.canvas.create_oval(0,0,10,10, fill='#E74C3C', outline='#922B21', width=2)
-
-    def update_car(self):
-        angle = math.radians(self.car_angle)
-        cos_a, sin_a = math.cos(angle), math.sin(angle)
-        # Body coords
-        coords = [
-            self.car_x + 15*cos_a - 10*sin_a, self.car_y + 15*sin_a + 10*cos_a,
-            self.car_x + 15*cos_a + 10*sin_a, self.car_y + 15*sin_a - 10*cos_a,
-            self.car_x - 15*cos_a + 10*sin_a, self.car_y - 15*sin_a - 10*cos_a,
-            self.car_x - 15*cos_a - 10*sin_a, self.car_y - 15*sin_a + 10*cos_a
-        ]
-        self.canvas.coords(self.body, *coords)
-        # Wheels
-        self._update_wheel(self.left_wheel, -10, angle)
-        self._update_wheel(self.right_wheel, 10, angle)
-        # Sensors
-        sl, sr = self.get_sensor_positions()
-        self.canvas.coords(self.sensor_left, sl[0]-5, sl[1]-5, sl[0]+5, sl[1]+5)
-        self.canvas.coords(self.sensor_right, sr[0]-5, sr[1]-5, sr[0]+5, sr[1]+5)
-
-    def _update_wheel(self, wheel, offset, angle):
-        x = self.car_x + offset * math.sin(angle)
-        y = self.car_y - offset * math.cos(angle)
-        self.canvas.coords(wheel, x-6, y-6, x+6, y+6)
+    def update_pose(self):
+        # Seno, coseno y sensores se calculan una vez por paso; la vista los reutiliza
+        a = math.radians(self.car_angle)
+        self.cos_a, self.sin_a = math.cos(a), math.sin(a)
+        fx = self.car_x + self.sensor_distance * self.cos_a
+        fy = self.car_y + self.sensor_distance * self.sin_a
+        ox, oy = self.sensor_offset * self.sin_a, self.sensor_offset * self.cos_a
+        self.sensor_left = (fx - ox, fy + oy)
+        self.sensor_right = (fx + ox, fy - oy)
 
     def get_sensor_positions(self):
-        a = math.radians(self.car_angle)
-        fx = self.car_x + self.sensor_distance * math.cos(a)
-        fy = self.car_y + self.sensor_distance * math.sin(a)
-        ls = (fx - self.sensor_offset * math.sin(a), fy + self.sensor_offset * math.cos(a))
-        rs = (fx + self.sensor_offset * math.sin(a), fy - self.sensor_offset * math.cos(a))
-        return ls, rs
+        return self.sensor_left, self.sensor_right
 
     def check_stop_bar(self, sl, sr):
         # Verificar si ambos sensores detectan la barra de parada
-        left_stop = self.check_sensor_stop_bar(*sl)
-        right_stop = self.check_sensor_stop_bar(*sr)
-        return left_stop and right_stop
+        return self.check_sensor_stop_bar(*sl) and self.check_sensor_stop_bar(*sr)
 
     def check_sensor_stop_bar(self, x, y):
-        overlap = self.canvas.find_overlapping(x-5, y-5, x+5, y+5)
-        return stop_bar in overlap
+        return self.sensors.on_stop_bar(x, y)
+
+    def check_sensor(self, x, y):
+        return self.sensors.on_line(x, y)
 
-    def move(self):
-        now = time.time()
-        dt = now - self.last_time if now - self.last_time > 0 else 1e-3
-        self.last_time = now
+    def step(self):
+        # Un paso de DT segundos; devuelve False cuando el carro ya está detenido
+        if self.stopping:
+            return False
+        dt = self.dt
+        self.sim_time += dt
+        self.steps += 1
 
-        sl, sr = self.get_sensor_positions()
+        sl, sr = self.sensor_left, self.sensor_right
         sc = ((sl[0]+sr[0])/2, (sl[1]+sr[1])/2)
-        
+
         # Verificar si el carro debe detenerse
         if self.check_stop_bar(sl, sr):
             self.stopping = True
-            # Mostrar mensaje de parada
-            self.canvas.create_text(self.car_x, self.car_y - 30, 
-                                   text="¡DETENIDO!", 
-                                   font=("Arial", 12, "bold"),
-                                   fill="red")
-            return
-        
-        # Si el carro está detenido, no seguir moviendo
-        if self.stopping:
-            return
-            
+            self.state = 'stopped'
+            self.steering = 0.0
+            return False
+
         left_active = self.check_sensor(*sl)
         right_active = self.check_sensor(*sr)
         center_active = self.check_sensor(*sc)
@@ -132,13 +146,16 @@ class LineFollowerCar:
             state = 'right'
         elif center_active:
             state = 'center'
+        self.state = state
 
         # Control
+        self.steering = 0.0
         if state == 'none':
+            # Sin línea: zigzag cada medio segundo de tiempo simulado
             self.speed = 0.8
-            if time.time() - self.last_angle_change > 0.5:
-                self.last_angle_change = time.time()
-                self.car_angle += 2 if int(time.time()*2)%2==0 else -2
+            if self.sim_time - self.last_angle_change > 0.5:
+                self.last_angle_change = self.sim_time
+                self.car_angle += 2 if int(self.sim_time*2)%2==0 else -2
         else:
             self.speed = 1.5 if state == 'both' else 1.3 if state=='center' else 1.0
             # Error invertido para giros correctos
@@ -149,35 +166,55 @@ class LineFollowerCar:
             steering = self.pid.compute(error, dt)
             steering = max(-self.max_turn_rate, min(steering, self.max_turn_rate))
             self.car_angle += steering
+            self.steering = steering
 
         rad = math.radians(self.car_angle)
-        self.car_x = max(20, min(self.car_x + self.speed*math.cos(rad), 780))
-        self.car_y = max(20, min(self.car_y + self.speed*math.sin(rad), 580))
-        self.trail.append((self.car_x, self.car_y))
-        if len(self.trail)>100: self.trail.pop(0)
-        self.update_car()
+        w, h = self.size
+        self.car_x = max(20, min(self.car_x + self.speed*math.cos(rad), w - 20))
+        self.car_y = max(20, min(self.car_y + self.speed*math.sin(rad), h - 20))
+        self.update_pose()
+        self.update_progress()
+        return True
 
-    def check_sensor(self, x, y):
-        overlap = self.canvas.find_overlapping(x-5, y-5, x+5, y+5)
-        return guide_line in overlap
+    def update_progress(self):
+        # Avance sobre la pista por longitud de arco, con la vuelta de la curva cerrada desenrollada
+        if self.course is None:
+            return
+        self.cross_track, progress = self.course.field.project(self.car_x, self.car_y)
+        if self.progress is not None:
+            length = self.course.length
+            delta = progress - self.progress
+            if delta < -length / 2:
+                delta += length
+            elif delta > length / 2:
+                delta -= length
+            if abs(delta) <= MAX_PROGRESS_STEP:
+                self.travelled += delta
+        self.progress = progress
+        # Una vuelta en sentido contrario también pasa por todas las estaciones
+        self._laps = max(self._laps, int(abs(self.travelled) // self.course.length))
 
-# Función de pista con paradas
-def create_track_path(stops):
-    pts = []
-    pts.append(stops[0])
-    for p in stops[1:]: pts.append(p)
-    pts.append(stops[0])
-    return [coord for pt in pts for coord in pt]
+    @property
+    def laps(self):
+        # Vueltas completas; nunca disminuye. Sin pista (sensores del canvas) se
+        # estima por el rumbo: en un circuito cerrado gira 360° por vuelta
+        if self.course is None:
+            self._laps = max(self._laps, int(abs(self.car_angle - self.start_angle) // 360))
+        return self._laps
 
-# Ventana principal
-global guide_line, stop_bar
-window = tk.Tk()
-window.title("Seguidor de Línea con Pista Extendida")
-canvas = tk.Canvas(window, width=800, height=600)
-canvas.pack()
+    def run(self, max_time=600.0, laps=None):
+        # Simula sin ventana hasta detenerse en la barra, completar `laps` vueltas
+        # o agotar max_time segundos simulados
+        max_steps = int(max_time / self.dt)
+        while self.steps < max_steps and self.step():
+            if laps is not None and self.laps >= laps:
+                break
+        return self.stopping
 
-# Definir paradas para formar una pista con curvas adicionales
-stops = [
+# ===================== PISTA ========================
+
+# Paradas que forman una pista con curvas adicionales
+STOPS = [
     (150, 500),   # Punto de inicio/fin (esquina inferior izquierda)
     (150, 400),   # Curva 1
     (300, 400),   # Curva 2
@@ -192,43 +229,1244 @@ stops = [
     (650, 450),   # Curva 11
     (400, 450),   # Curva 12
 ]
+TRACK_WIDTH = 30  # pista gris: más allá de la mitad el carro está fuera de pista
+GUIDE_WIDTH = 15
+STOP_BAR_OUTLINE = 2
+
+# Función de pista con paradas
+def create_track_path(stops):
+    pts = []
+    pts.append(stops[0])
+    for p in stops[1:]: pts.append(p)
+    pts.append(stops[0])
+    return [coord for pt in pts for coord in pt]
+
+# ===================== MÁSCARAS DE OCUPACIÓN ========================
+# Una capa de ocupación dice, para cada píxel, si un sensor centrado ahí vería el
+# ítem con find_overlapping(x-5, y-5, x+5, y+5). Se calculan por mosaico (ver
+# MOSAICOS), así la consulta es leer una celda en vez de recorrer el canvas.
+
+def bezier_points(coords, steps=SPLINE_STEPS):
+    # Misma curva que TkMakeBezierCurve: la que Tk dibuja y usa en find_overlapping
+    pts = list(zip(coords[0::2], coords[1::2]))
+    n = len(pts)
+    out = []
+
+    def spline(c):
+        for i in range(1, steps + 1):
+            t = i / steps
+            u = 1 - t
+            out.append((c[0]*u**3 + 3*(c[2]*t*u*u + c[4]*t*t*u) + c[6]*t**3,
+                        c[1]*u**3 + 3*(c[3]*t*u*u + c[5]*t*t*u) + c[7]*t**3))
+
+    closed = pts[0] == pts[-1]
+    if closed:
+        (px, py), (x0, y0), (x1, y1) = pts[-2], pts[0], pts[1]
+        c = [0.5*px + 0.5*x0, 0.5*py + 0.5*y0, 0.167*px + 0.833*x0, 0.167*py + 0.833*y0,
+             0.833*x0 + 0.167*x1, 0.833*y0 + 0.167*y1, 0.5*x0 + 0.5*x1, 0.5*y0 + 0.5*y1]
+        out.append((c[0], c[1]))
+        spline(c)
+    else:
+        out.append(pts[0])
+
+    for i in range(2, n):
+        (x0, y0), (x1, y1), (x2, y2) = pts[i-2], pts[i-1], pts[i]
+        if i == 2 and not closed:
+            c = [x0, y0, 0.333*x0 + 0.667*x1, 0.333*y0 + 0.667*y1]
+        else:
+            c = [0.5*x0 + 0.5*x1, 0.5*y0 + 0.5*y1, 0.167*x0 + 0.833*x1, 0.167*y0 + 0.833*y1]
+        if i == n - 1 and not closed:
+            c += [0.667*x1 + 0.333*x2, 0.667*y1 + 0.333*y2, x2, y2]
+        else:
+            c += [0.833*x1 + 0.167*x2, 0.833*y1 + 0.167*y2, 0.5*x1 + 0.5*x2, 0.5*y1 + 0.5*y2]
+        if (x0, y0) == (x1, y1) or (x1, y1) == (x2, y2):
+            out.append((c[6], c[7]))
+        else:
+            spline(c)
+    return out
+
+def _segment_near_box(ax, ay, bx, by, X, Y, half, radius):
+    # ¿El segmento a-b pasa a `radius` o menos del cuadrado de lado 2*half centrado
+    # en cada (X, Y)? Es la prueba de Tk para una línea gruesa de unión y punta
+    # redondas: el trazo son los puntos a width/2 o menos de la polilínea.
+    dx, dy = bx - ax, by - ay
+    len2 = dx*dx + dy*dy
+    r2 = radius * radius
+
+    def box_dist2(px, py):
+        ex = np.maximum(np.abs(px - X) - half, 0)
+        ey = np.maximum(np.abs(py - Y) - half, 0)
+        return ex*ex + ey*ey
+
+    near = (box_dist2(ax, ay) <= r2) | (box_dist2(bx, by) <= r2)
+    # Entre un segmento y un cuadrado disjuntos, la distancia mínima se da en un
+    # extremo del segmento o en una esquina del cuadrado
+    for sx in (-half, half):
+        for sy in (-half, half):
+            cx, cy = X + sx, Y + sy
+            t = np.clip(((cx - ax)*dx + (cy - ay)*dy) / len2, 0, 1) if len2 else 0
+            qx, qy = ax + t*dx - cx, ay + t*dy - cy
+            near |= qx*qx + qy*qy <= r2
+
+    # Si el segmento cruza el cuadrado la distancia es cero (prueba de franjas)
+    tmin = np.zeros(X.shape)
+    tmax = np.ones(X.shape)
+    for a, d, c in ((ax, dx, X), (ay, dy, Y)):
+        if d == 0:
+            outside = (a < c - half) | (a > c + half)
+            tmax = np.where(outside, -1.0, tmax)
+        else:
+            t1, t2 = (c - half - a) / d, (c + half - a) / d
+            tmin = np.maximum(tmin, np.minimum(t1, t2))
+            tmax = np.minimum(tmax, np.maximum(t1, t2))
+    return near | (tmin <= tmax)
+
+def line_occupancy(pts, segments, width, x0, y0, shape, half=SENSOR_HALF):
+    # Ventana de `shape` píxeles con origen (x0, y0) tocada por los segmentos
+    # pts[k]-pts[k+1] de una línea de canvas con capstyle/joinstyle ROUND
+    h, w = shape
+    grid = np.zeros(shape, bool)
+    reach = width / 2 + half + 1
+    for k in segments:
+        (ax, ay), (bx, by) = pts[k], pts[k + 1]
+        # Solo los píxeles dentro de la caja del segmento más el alcance del sensor
+        c0 = max(int(min(ax, bx) - reach) - x0, 0)
+        c1 = min(int(max(ax, bx) + reach) + 1 - x0, w)
+        r0 = max(int(min(ay, by) - reach) - y0, 0)
+        r1 = min(int(max(ay, by) + reach) + 1 - y0, h)
+        if c0 >= c1 or r0 >= r1:
+            continue
+        Y, X = np.mgrid[y0 + r0:y0 + r1, x0 + c0:x0 + c1].astype(float)
+        grid[r0:r1, c0:c1] |= _segment_near_box(ax, ay, bx, by, X, Y, half, width / 2)
+    return grid
+
+def rect_occupancy(rect, outline_width, x0, y0, shape, half=SENSOR_HALF):
+    # Rectángulo relleno: Tk lo agranda la mitad del borde y exige cruce estricto
+    x1, y1, x2, y2 = rect
+    grow = outline_width / 2 + half
+    Y, X = np.mgrid[y0:y0 + shape[0], x0:x0 + shape[1]]
+    return (X > x1 - grow) & (X < x2 + grow) & (Y > y1 - grow) & (Y < y2 + grow)
+
+def nearest_segments(a, d, x0, y0, shape, rows=8):
+    # Para cada píxel de la ventana: distancia con signo al más cercano de los
+    # segmentos (inicio a, dirección d) y su posición en la lista. Fuerza bruta por
+    # franjas de filas: cada píxel contra todos los segmentos dados.
+    h, w = shape
+    len2 = np.maximum((d ** 2).sum(axis=1), 1e-12)
+    sdf = np.empty(shape, np.float32)
+    seg = np.empty(shape, np.intp)
+    X = np.arange(x0, x0 + w, dtype=float)[None, :, None]
+    for r0 in range(0, h, rows):
+        Y = np.arange(y0 + r0, y0 + min(r0 + rows, h), dtype=float)[:, None, None]
+        t = np.clip(((X - a[:, 0]) * d[:, 0] + (Y - a[:, 1]) * d[:, 1]) / len2, 0, 1)
+        qx = a[:, 0] + t * d[:, 0] - X
+        qy = a[:, 1] + t * d[:, 1] - Y
+        dist2 = qx * qx + qy * qy
+        k = dist2.argmin(axis=2)
+        best = np.take_along_axis(dist2, k[..., None], axis=2)[..., 0]
+        # Signo: positivo a la derecha del sentido de avance (y crece hacia abajo)
+        cross = d[k, 0] * -np.take_along_axis(qy, k[..., None], axis=2)[..., 0] \
+            - d[k, 1] * -np.take_along_axis(qx, k[..., None], axis=2)[..., 0]
+        sdf[r0:r0 + rows] = np.where(cross < 0, -1, 1) * np.sqrt(best)
+        seg[r0:r0 + rows] = k
+    return sdf, seg
+
+# ===================== MOSAICOS ========================
+# El mundo se parte en mosaicos de TILE_SIZE px. Cada uno guarda, por píxel, las
+# dos capas de ocupación (guía y barras), la distancia con signo a la curva y el
+# índice del segmento más cercano. Un mosaico se arma la primera vez que alguien
+# lo consulta, usando solo los segmentos que pasan cerca, y queda en disco: las
+# corridas siguientes lo abren con mmap. Así arrancar no depende del área del
+# mundo y en memoria solo están los MAX_TILES mosaicos usados más recientemente.
+#
+# La distancia se guarda hasta FIELD_REACH px; más lejos la celda dice "lejos"
+# (inf, segmento -1) y project() busca entre todos los segmentos.
+
+TILE_SIZE = 256
+FIELD_REACH = 64
+MAX_TILES = 64
+TILE_VERSION = 1
+TILE_FIELDS = [('guide', '?'), ('stop', '?'), ('sdf', '<f4'), ('seg', '<i4')]
+
+class TrackTiles:
+    def __init__(self, polyline, stop_bars, size, tile_size=TILE_SIZE, cache_dir=CACHE_DIR,
+                 max_open=MAX_TILES):
+        pts = np.asarray(polyline, float)
+        self.points = pts
+        self.stop_bars = [tuple(float(v) for v in bar) for bar in stop_bars]
+        self.size = tuple(size)
+        self.tile_size = tile_size
+        self.max_open = max_open
+        self.closed = bool(np.allclose(pts[0], pts[-1]))
+        self.seg_start = pts[:-1]
+        self.seg_dir = pts[1:] - pts[:-1]
+        self.seg_len = np.hypot(self.seg_dir[:, 0], self.seg_dir[:, 1])
+        self.arc = np.concatenate([[0.0], np.cumsum(self.seg_len)])  # longitud hasta cada vértice
+        self.length = float(self.arc[-1])
+
+        w, h = self.size
+        self.cols = -(-w // tile_size)
+        self.rows = -(-h // tile_size)
+        self.dtype = np.dtype(TILE_FIELDS)
+        self.open = OrderedDict()  # (tx, ty) -> capas del mosaico, el más reciente al final
+        self.built = self.loaded = 0
+        self._empty = None
+
+        key = hashlib.sha1(pts.tobytes() + repr((self.stop_bars, self.size, tile_size, FIELD_REACH,
+                                                 GUIDE_WIDTH, STOP_BAR_OUTLINE, SENSOR_HALF,
+                                                 TILE_VERSION)).encode()).hexdigest()[:16]
+        self.cache_dir = os.path.join(cache_dir, f'mosaicos-{key}') if cache_dir else None
+
+        # Qué segmentos y barras tocan cada mosaico (con el alcance de la distancia)
+        reach = max(FIELD_REACH, GUIDE_WIDTH / 2 + SENSOR_HALF + 1)
+        self.segments = {}
+        lo = np.minimum(pts[:-1], pts[1:]) - reach
+        hi = np.maximum(pts[:-1], pts[1:]) + reach
+        for k, ((x1, y1), (x2, y2)) in enumerate(zip(lo, hi)):
+            for tile in self._tiles_in(x1, y1, x2, y2):
+                self.segments.setdefault(tile, []).append(k)
+        self.bars = {}
+        grow = STOP_BAR_OUTLINE / 2 + SENSOR_HALF
+        for b, (x1, y1, x2, y2) in enumerate(self.stop_bars):
+            for tile in self._tiles_in(x1 - grow, y1 - grow, x2 + grow, y2 + grow):
+                self.bars.setdefault(tile, []).append(b)
+
+    def _tiles_in(self, x1, y1, x2, y2):
+        t = self.tile_size
+        for ty in range(max(int(y1 // t), 0), min(int(y2 // t), self.rows - 1) + 1):
+            for tx in range(max(int(x1 // t), 0), min(int(x2 // t), self.cols - 1) + 1):
+                yield tx, ty
+
+    def segments_in(self, tx, ty):
+        return self.segments.get((tx, ty), [])
+
+    def tile(self, tx, ty):
+        # Capas del mosaico como arreglos simples (vistas del archivo mapeado)
+        key = (tx, ty)
+        layers = self.open.get(key)
+        if layers is not None:
+            self.open.move_to_end(key)
+            return layers
+        if key not in self.segments and key not in self.bars:
+            # Lejos de todo: un solo mosaico vacío compartido, ni se arma ni se guarda
+            if self._empty is None:
+                grid = np.zeros((self.tile_size, self.tile_size), self.dtype)
+                grid['sdf'] = np.inf
+                grid['seg'] = -1
+                self._empty = {name: grid[name] for name, _ in TILE_FIELDS}
+            return self._empty
+        grid = self._load_or_build(tx, ty)
+        layers = self.open[key] = {name: np.asarray(grid[name]) for name, _ in TILE_FIELDS}
+        if len(self.open) > self.max_open:
+            self.open.popitem(last=False)
+        return layers
+
+    def _load_or_build(self, tx, ty):
+        path = os.path.join(self.cache_dir, f'{tx}_{ty}.npy') if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                grid = np.load(path, mmap_mode='r')
+                self.loaded += 1
+                return grid
+            except (OSError, ValueError):
+                pass
+        grid = self._build(tx, ty)
+        self.built += 1
+        if path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # Temporal propio de cada proceso: varios pueden construir a la vez
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, grid)
+                os.replace(tmp_path, path)
+                return np.load(path, mmap_mode='r')
+            except (OSError, ValueError) as e:
+                print(f"⚠️ No se pudieron guardar los mosaicos de la pista: {e}")
+                self.cache_dir = None
+        return grid
+
+    def _build(self, tx, ty):
+        t = self.tile_size
+        x0, y0 = tx * t, ty * t
+        shape = (t, t)
+        grid = np.zeros(shape, self.dtype)
+        segments = np.array(self.segments_in(tx, ty), np.intp)
+        grid['guide'] = line_occupancy(self.points, segments, GUIDE_WIDTH, x0, y0, shape)
+        for b in self.bars.get((tx, ty), []):
+            grid['stop'] |= rect_occupancy(self.stop_bars[b], STOP_BAR_OUTLINE, x0, y0, shape)
+        if len(segments):
+            sdf, k = nearest_segments(self.seg_start[segments], self.seg_dir[segments], x0, y0, shape)
+            far = np.abs(sdf) > FIELD_REACH
+            grid['sdf'] = np.where(far, np.inf, sdf)
+            grid['seg'] = np.where(far, -1, segments[k])
+        else:
+            grid['sdf'] = np.inf
+            grid['seg'] = -1
+        return grid
+
+    def build_all(self):
+        # Arma (o deja en disco) todos los mosaicos con algo de pista
+        for tx, ty in sorted(set(self.segments) | set(self.bars)):
+            self.tile(tx, ty)
+
+    def value(self, layer, x, y, outside):
+        # Capa en el píxel más cercano a (x, y); `outside` fuera del mundo
+        i, j = math.floor(y + 0.5), math.floor(x + 0.5)
+        w, h = self.size
+        if 0 <= i < h and 0 <= j < w:
+            t = self.tile_size
+            return self.tile(j // t, i // t)[layer][i % t, j % t]
+        return outside
+
+    def gather(self, layer, xs, ys, outside):
+        # Lo mismo para arreglos de puntos: una lectura por mosaico tocado
+        i = np.floor(np.asarray(ys, float) + 0.5).astype(np.intp)
+        j = np.floor(np.asarray(xs, float) + 0.5).astype(np.intp)
+        w, h = self.size
+        inside = (i >= 0) & (i < h) & (j >= 0) & (j < w)
+        out = np.full(inside.shape, outside, self.dtype[layer])
+        if not inside.any():
+            return out
+        i, j = i[inside], j[inside]
+        t = self.tile_size
+        keys = (i // t) * self.cols + j // t
+        if len(keys) and (keys == keys[0]).all():
+            # Lo usual: todos los puntos caen en el mismo mosaico
+            ty, tx = divmod(int(keys[0]), self.cols)
+            out[inside] = self.tile(tx, ty)[layer][i % t, j % t]
+            return out
+        # Agrupados por mosaico: cada grupo es un tramo contiguo tras ordenar
+        order = keys.argsort(kind='stable')
+        keys, i, j = keys[order], i[order] % t, j[order] % t
+        bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        values = np.empty(len(keys), self.dtype[layer])
+        for lo, hi in zip([0, *bounds.tolist()], [*bounds.tolist(), len(keys)]):
+            ty, tx = divmod(int(keys[lo]), self.cols)
+            values[lo:hi] = self.tile(tx, ty)[layer][i[lo:hi], j[lo:hi]]
+        out[np.flatnonzero(inside)[order]] = values
+        return out
+
+    def _closest_segment(self, x, y):
+        return int(self._closest_segments(np.array([x], float), np.array([y], float))[0])
+
+    def _closest_segments(self, xs, ys, chunk=256):
+        # Segmento más cercano de cada punto: matriz (puntos × segmentos) por bloques
+        a, d = self.seg_start, self.seg_dir
+        len2 = np.maximum(self.seg_len ** 2, 1e-12)
+        out = np.empty(len(xs), np.intp)
+        for s in range(0, len(xs), chunk):
+            x = xs[s:s + chunk, None]
+            y = ys[s:s + chunk, None]
+            t = np.clip(((x - a[:, 0]) * d[:, 0] + (y - a[:, 1]) * d[:, 1]) / len2, 0, 1)
+            qx = a[:, 0] + t * d[:, 0] - x
+            qy = a[:, 1] + t * d[:, 1] - y
+            out[s:s + chunk] = (qx * qx + qy * qy).argmin(axis=1)
+        return out
+
+    def project(self, x, y):
+        # (distancia con signo, avance en px desde el inicio de la curva)
+        k = int(self.value('seg', x, y, -1))
+        if k < 0:
+            # Lejos de la curva o fuera del mundo: se busca entre todos los segmentos
+            k = self._closest_segment(x, y)
+        n = len(self.seg_len)
+        best = None
+        for m in (k - 1, k, k + 1):
+            if self.closed:
+                m %= n
+            elif not 0 <= m < n:
+                continue
+            ax, ay = self.seg_start[m]
+            dx, dy = self.seg_dir[m]
+            len2 = max(dx * dx + dy * dy, 1e-12)
+            t = min(max(((x - ax) * dx + (y - ay) * dy) / len2, 0.0), 1.0)
+            qx, qy = ax + t * dx - x, ay + t * dy - y
+            dist2 = qx * qx + qy * qy
+            if best is None or dist2 < best[0]:
+                best = (dist2, m, t, dx * -qy - dy * -qx)
+        dist2, m, t, cross = best
+        signed = math.sqrt(dist2) if cross >= 0 else -math.sqrt(dist2)
+        return signed, float(self.arc[m] + t * self.seg_len[m])
+
+    def project_many(self, xs, ys):
+        # project() de muchos puntos a la vez: arreglos (distancia con signo, avance)
+        xs, ys = np.asarray(xs, float), np.asarray(ys, float)
+        k = self.gather('seg', xs, ys, -1).astype(np.intp)
+        far = k < 0
+        if far.any():
+            k[far] = self._closest_segments(xs[far], ys[far])
+        n = len(self.seg_len)
+        m = np.stack([k - 1, k, k + 1])
+        m = m % n if self.closed else np.clip(m, 0, n - 1)
+        a, d = self.seg_start[m], self.seg_dir[m]
+        len2 = np.maximum(d[..., 0] ** 2 + d[..., 1] ** 2, 1e-12)
+        t = np.minimum(np.maximum(((xs - a[..., 0]) * d[..., 0] + (ys - a[..., 1]) * d[..., 1]) / len2, 0), 1)
+        qx = a[..., 0] + t * d[..., 0] - xs
+        qy = a[..., 1] + t * d[..., 1] - ys
+        best = (qx * qx + qy * qy).argmin(axis=0), np.arange(len(xs))
+        m, t, qx, qy = m[best], t[best], qx[best], qy[best]
+        dist = np.hypot(qx, qy)
+        cross = self.seg_dir[m, 0] * -qy - self.seg_dir[m, 1] * -qx
+        return np.where(cross >= 0, dist, -dist), self.arc[m] + t * self.seg_len[m]
+
+    def distance_many(self, xs, ys):
+        # Distancias con signo de muchos puntos (al píxel más cercano; inf si lejos)
+        return self.gather('sdf', xs, ys, np.inf)
+
+class TiledLayer:
+    # Una capa de los mosaicos con la interfaz de consulta de los sensores
+    def __init__(self, tiles, layer):
+        self.tiles = tiles
+        self.layer = layer
+
+    def query(self, x, y):
+        # Sensor en coordenadas del mundo: se redondea al píxel más cercano
+        return bool(self.tiles.value(self.layer, x, y, False))
+
+    def query_many(self, xs, ys):
+        # Muchos sensores en una sola lectura: arreglos de x e y -> arreglo bool
+        return self.tiles.gather(self.layer, xs, ys, False)
+
+class Track:
+    # Geometría de la pista, independiente del canvas. Con NumPy también responde
+    # a los sensores del carro desde las capas de ocupación de los mosaicos.
+    # stops son las estaciones; path, la línea que las recorre (por defecto, las
+    # estaciones en orden y de vuelta a la primera).
+    def __init__(self, stops=STOPS, size=CANVAS_SIZE, path=None, stop_bars=None, start=None,
+                 cache_dir=CACHE_DIR):
+        self.stops = [tuple(p) for p in stops]
+        self.size = tuple(size)
+        self.path = list(path) if path is not None else create_track_path(self.stops)
+        if stop_bars is None:
+            # Barra de parada en el punto final (primer punto)
+            s_end_x, s_end_y = self.stops[0]
+            stop_bars = [(s_end_x-40, s_end_y-5, s_end_x+40, s_end_y+5)]
+        self.stop_bars = [tuple(bar) for bar in stop_bars]
+        if start is None:
+            # En el primer punto del recorrido, mirando hacia el segundo
+            x0, y0, x1, y1 = self.path[:4]
+            start = (x0, y0, math.degrees(math.atan2(y1 - y0, x1 - x0)) % 360)
+        self.start = tuple(start)
+        self.guide_mask = self.stop_mask = self.polyline = self.tiles = None
+        if np is not None:
+            self.polyline = np.array(bezier_points(self.path))
+            # Una pista que cabe en la ventana es un solo mosaico: cada consulta lee un arreglo
+            tile_size = max(self.size) if self.fits() else TILE_SIZE
+            self.tiles = TrackTiles(self.polyline, self.stop_bars, self.size, tile_size, cache_dir)
+            self.guide_mask = TiledLayer(self.tiles, 'guide')
+            self.stop_mask = TiledLayer(self.tiles, 'stop')
+
+    @property
+    def field(self):
+        # Distancias y avance: los mosaicos se arman (o se leen de disco) al consultarlos
+        return self.tiles
+
+    @property
+    def length(self):
+        return self.field.length
+
+    def distance(self, x, y):
+        # Distancia del punto al centro de la línea guía (la curva suavizada)
+        return abs(self.field.project(x, y)[0])
+
+    def cross_track(self, x, y):
+        return self.field.project(x, y)[0]
+
+    def progress(self, x, y):
+        return self.field.project(x, y)[1]
+
+    def off_track(self, x, y):
+        return abs(self.field.project(x, y)[0]) > TRACK_WIDTH / 2
+
+    def on_line(self, x, y):
+        return self.guide_mask.query(x, y)
+
+    def on_stop_bar(self, x, y):
+        return self.stop_mask.query(x, y)
+
+    def fits(self, view_size=CANVAS_SIZE):
+        return self.size[0] <= view_size[0] and self.size[1] <= view_size[1]
+
+# ===================== ARCHIVOS DE PISTA ========================
+# JSON con el tamaño del mundo, la pose inicial, las estaciones, los puntos del
+# recorrido (la línea guía suavizada pasa por ellos como en Tk) y las barras de
+# parada como rectángulos x1, y1, x2, y2.
+
+TRACK_FORMAT = 'pista-seguidor'
+TRACK_VERSION = 1
+
+def save_track(track, path):
+    data = {'format': TRACK_FORMAT, 'version': TRACK_VERSION,
+            'size': list(track.size), 'start': list(track.start),
+            'stations': [list(p) for p in track.stops],
+            'path': [list(p) for p in zip(track.path[0::2], track.path[1::2])],
+            'stop_bars': [list(bar) for bar in track.stop_bars]}
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+def load_track(path, cache_dir=CACHE_DIR):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('format') != TRACK_FORMAT or data.get('version') != TRACK_VERSION:
+        raise ValueError(f"{path} no es un archivo de pista compatible")
+    return Track(data['stations'], data['size'], path=[c for pt in data['path'] for c in pt],
+                 stop_bars=data['stop_bars'], start=data['start'], cache_dir=cache_dir)
+
+def warehouse_track(rows, cols, spacing=150):
+    # Almacén de prueba: rows x cols estaciones recorridas en zigzag por los
+    # pasillos y un pasillo de regreso por la izquierda. Con rows impar se agrega
+    # una fila para que el zigzag termine del lado del regreso.
+    rows += rows % 2
+    stations = []
+    for r in range(rows):
+        xs = [(c + 2) * spacing for c in range(cols)]
+        stations += [(x, (r + 1) * spacing) for x in (xs[::-1] if r % 2 else xs)]
+    bottom = rows * spacing
+    path = stations + [(spacing, bottom), (spacing, spacing), stations[0]]
+    x, y = stations[0]
+    return Track(stations, ((cols + 2) * spacing, (rows + 1) * spacing),
+                 path=[c for pt in path for c in pt], stop_bars=[(x-5, y-40, x+5, y+40)])
+
+class CanvasSensors:
+    # Sensores consultando el canvas con find_overlapping (solo si falta NumPy)
+    def __init__(self, canvas, guide_line, stop_bars):
+        self.canvas = canvas
+        self.guide_line = guide_line
+        self.stop_bars = stop_bars
+
+    def on_line(self, x, y):
+        return self.guide_line in self.canvas.find_overlapping(x-5, y-5, x+5, y+5)
+
+    def on_stop_bar(self, x, y):
+        found = self.canvas.find_overlapping(x-5, y-5, x+5, y+5)
+        return any(bar in found for bar in self.stop_bars)
+
+# ===================== FLOTA (NUMPY) ========================
+# Muchas variantes del carro sobre la misma pista. Cada atributo de LineFollowerCar
+# es un arreglo con un valor por carro y step() avanza a todos con operaciones
+# vectorizadas; los sensores se leen de las máscaras en una sola consulta.
+
+# Parámetros por carro además de DEFAULT_TUNING; speed_scale multiplica las
+# velocidades de cada estado (0.8 sin línea, 1.0 girando, 1.3 centro, 1.5 ambos)
+FLEET_DEFAULTS = {**DEFAULT_TUNING, 'speed_scale': 1.0, 'sensor_distance': 30, 'sensor_offset': 20}
+
+def random_variants(n, seed=0):
+    # Variantes alrededor de los valores por defecto, reproducibles con la semilla
+    rng = np.random.default_rng(seed)
+    return [{**FLEET_DEFAULTS,
+             'Kp': float(rng.uniform(1, 6)),
+             'max_turn_rate': float(rng.uniform(1.5, 5)),
+             'smoothing': float(rng.uniform(0.1, 0.7)),
+             'speed_scale': float(rng.uniform(0.7, 1.5)),
+             'sensor_distance': float(rng.uniform(20, 40)),
+             'sensor_offset': float(rng.uniform(12, 28))}
+            for _ in range(n)]
+
+class Fleet:
+    def __init__(self, track, variants, dt=DT, start=None):
+        unknown = {name for v in variants for name in v} - set(FLEET_DEFAULTS)
+        if unknown:
+            raise ValueError(f"parámetros de variante desconocidos: {', '.join(sorted(unknown))}")
+        self.track = track
+        self.dt = dt
+        self.n = n = len(variants)
+        self.variants = [{**FLEET_DEFAULTS, **v} for v in variants]
+        for name in FLEET_DEFAULTS:
+            setattr(self, name, np.array([v[name] for v in self.variants], float))
+
+        x, y, angle = start or track.start
+        self.x = np.full(n, float(x))
+        self.y = np.full(n, float(y))
+        self.angle = np.full(n, float(angle))
+        self.start_angle = self.angle.copy()
+        self.speed = np.full(n, 1.5)
+        self.prev_error = np.zeros(n)
+        self.integral = np.zeros(n)
+        self.last_output = np.zeros(n)
+        self.last_angle_change = np.zeros(n)
+        self.sim_time = np.zeros(n)
+        self.stopping = np.zeros(n, bool)
+        self.lap_time = np.full(n, np.nan)  # tiempo de la primera vuelta de cada carro
+        # Vueltas por avance sobre la pista, como LineFollowerCar.update_progress()
+        self.travelled = np.zeros(n)
+        self.completed = np.zeros(n, int)
+        self.cross_track, self.progress = track.field.project_many(self.x, self.y)
+        self.update_pose()
+
+    def update_pose(self):
+        a = np.radians(self.angle)
+        self.cos_a, self.sin_a = np.cos(a), np.sin(a)
+        fx = self.x + self.sensor_distance * self.cos_a
+        fy = self.y + self.sensor_distance * self.sin_a
+        ox, oy = self.sensor_offset * self.sin_a, self.sensor_offset * self.cos_a
+        self.left_x, self.left_y = fx - ox, fy + oy
+        self.right_x, self.right_y = fx + ox, fy - oy
+
+    @property
+    def laps(self):
+        return self.completed
+
+    def update_progress(self):
+        length = self.track.length
+        self.cross_track, progress = self.track.field.project_many(self.x, self.y)
+        delta = progress - self.progress
+        delta = np.where(delta < -length / 2, delta + length,
+                         np.where(delta > length / 2, delta - length, delta))
+        self.travelled += np.where(np.abs(delta) <= MAX_PROGRESS_STEP, delta, 0.0)
+        self.progress = progress
+        self.completed = np.maximum(self.completed, (np.abs(self.travelled) // length).astype(int))
+
+    def step(self):
+        # Mismo paso que LineFollowerCar.step() para los carros que no se detuvieron
+        moving = ~self.stopping
+        dt = self.dt
+        self.sim_time[moving] += dt
+
+        guide, stop = self.track.guide_mask, self.track.stop_mask
+        cx, cy = (self.left_x + self.right_x) / 2, (self.left_y + self.right_y) / 2
+        # Los tres sensores de todos los carros en una consulta por máscara
+        hits = guide.query_many(np.concatenate([self.left_x, self.right_x, cx]),
+                                np.concatenate([self.left_y, self.right_y, cy]))
+        left, right, center = hits[:self.n], hits[self.n:2 * self.n], hits[2 * self.n:]
+        at_bar = stop.query_many(np.concatenate([self.left_x, self.right_x]),
+                                 np.concatenate([self.left_y, self.right_y]))
+        arrived = moving & at_bar[:self.n] & at_bar[self.n:]
+        self.stopping |= arrived
+        moving &= ~arrived
+
+        both = left & right
+        only_left = left & ~right
+        only_right = right & ~left
+        only_center = center & ~left & ~right
+        lost = moving & ~(left | right | center)
+        steer = moving & ~lost
+
+        # Sin línea: zigzag cada medio segundo de tiempo simulado
+        speed = np.select([both, only_center, only_left | only_right], [1.5, 1.3, 1.0], 0.8)
+        self.speed = np.where(moving, speed * self.speed_scale, self.speed)
+        wander = lost & (self.sim_time - self.last_angle_change > 0.5)
+        self.last_angle_change[wander] = self.sim_time[wander]
+        turn = np.where((self.sim_time * 2).astype(int) % 2 == 0, 2, -2)
+        self.angle[wander] += turn[wander]
+
+        # PID vectorizado; solo avanza el estado de los carros que ven la línea
+        error = np.select([only_left, only_right, only_center], [3.0, -3.0, 0.5 * self.prev_error], 0.0)
+        derivative = (error - self.prev_error) / dt * self.derivative_factor
+        integral = np.clip(self.integral + error * dt, -50, 50)
+        raw = self.Kp * error + self.Ki * integral + self.Kd * derivative
+        output = self.smoothing * raw + (1 - self.smoothing) * self.last_output
+        self.integral = np.where(steer, integral, self.integral)
+        self.last_output = np.where(steer, output, self.last_output)
+        self.prev_error = np.where(steer, error, self.prev_error)
+        self.angle += np.where(steer, np.clip(output, -self.max_turn_rate, self.max_turn_rate), 0)
+
+        rad = np.radians(self.angle)
+        w, h = self.track.size
+        self.x = np.where(moving, np.clip(self.x + self.speed * np.cos(rad), 20, w - 20), self.x)
+        self.y = np.where(moving, np.clip(self.y + self.speed * np.sin(rad), 20, h - 20), self.y)
+        self.update_pose()
+        self.update_progress()
+
+        first_lap = np.isnan(self.lap_time) & ((self.laps >= 1) | self.stopping)
+        self.lap_time[first_lap] = self.sim_time[first_lap]
+        return bool(moving.any())
+
+    def run(self, max_time=600.0, laps=1):
+        # Hasta que todos completen `laps` vueltas o se detengan, o se agote el tiempo
+        max_steps = int(max_time / self.dt)
+        for _ in range(max_steps):
+            if not self.step() or ((self.laps >= laps) | self.stopping).all():
+                break
+
+# ===================== VISTA (TK) ========================
+
+def item_counts(canvas):
+    # Ítems vivos en el canvas por tipo, para vigilar que no crezcan sin límite
+    return Counter(canvas.type(item) for item in canvas.find_all())
+
+def draw_track(canvas, track):
+    # Fondo y decoración
+    w, h = track.size
+    canvas.create_rectangle(0,0,w,h, fill='#7DCEA0', stipple='gray25')
+
+    # Pista base y línea guía
+    canvas.create_line(
+        track.path, fill='#566573', width=TRACK_WIDTH,
+        smooth=True, capstyle=tk.ROUND
+    )
+    guide_line = canvas.create_line(
+        track.path, fill='black', width=GUIDE_WIDTH,
+        smooth=True, joinstyle=tk.ROUND, capstyle=tk.ROUND
+    )
+
+    # Dibujar estaciones
+    for i, (x,y) in enumerate(track.stops, start=1):
+        canvas.create_oval(x-15, y-15, x+15, y+15,
+                           fill='#F1C40F', outline='#B7950B', width=3)
+        canvas.create_text(x, y, text=f"S{i}", font=("Arial",12,"bold"))
+
+    stop_bars = [canvas.create_rectangle(*bar, fill='black', outline='red', width=STOP_BAR_OUTLINE)
+                 for bar in track.stop_bars]
+    return guide_line, stop_bars
+
+class TiledTrackView:
+    # Pista más grande que la ventana: el canvas se desplaza siguiendo un punto y
+    # solo tiene los ítems de los mosaicos visibles. Los que salen de la vista se
+    # borran, así la cantidad de ítems no depende del tamaño de la pista.
+    LAYERS = ('pista', 'guia', 'marcas')  # de abajo hacia arriba
+
+    def __init__(self, canvas, track, view_size=CANVAS_SIZE):
+        self.canvas = canvas
+        self.track = track
+        self.tiles = track.tiles
+        self.view_size = view_size
+        self.shown = set()
+        canvas.configure(scrollregion=(0, 0, *track.size), background='#DEF2E7')
+        t = self.tiles.tile_size
+        self.stations = {}
+        for i, (x, y) in enumerate(track.stops, start=1):
+            self.stations.setdefault((int(x // t), int(y // t)), []).append((i, x, y))
+
+    def follow(self, x, y):
+        # Centra la vista en (x, y) sin salir del mundo; devuelve la esquina visible
+        w, h = self.view_size
+        world_w, world_h = self.track.size
+        left = min(max(x - w / 2, 0), max(world_w - w, 0))
+        top = min(max(y - h / 2, 0), max(world_h - h, 0))
+        self.canvas.xview_moveto(left / world_w)
+        self.canvas.yview_moveto(top / world_h)
+
+        t = self.tiles.tile_size
+        visible = {(tx, ty)
+                   for ty in range(int(top // t), min(int((top + h) // t), self.tiles.rows - 1) + 1)
+                   for tx in range(int(left // t), min(int((left + w) // t), self.tiles.cols - 1) + 1)}
+        for tx, ty in self.shown - visible:
+            self.canvas.delete(f'mosaico{tx}_{ty}')
+        entering = visible - self.shown
+        for tx, ty in entering:
+            self.draw_tile(tx, ty)
+        if entering:
+            # Las capas de los mosaicos quedan debajo del carro, la estela y los textos
+            for layer in reversed(self.LAYERS):
+                self.canvas.tag_lower(layer)
+        self.shown = visible
+        return left, top
+
+    def draw_tile(self, tx, ty):
+        canvas = self.canvas
+        tag = f'mosaico{tx}_{ty}'
+        pts = self.tiles.points
+        # Tramos de segmentos consecutivos que pasan por el mosaico, como polilíneas
+        # rectas: son los mismos puntos de la curva que Tk dibujaría con smooth=True
+        segments = self.tiles.segments_in(tx, ty)
+        runs = []
+        for k in segments:
+            if runs and k == runs[-1][1] + 1:
+                runs[-1][1] = k
+            else:
+                runs.append([k, k])
+        for first, last in runs:
+            coords = pts[first:last + 2].ravel().tolist()
+            canvas.create_line(coords, fill='#566573', width=TRACK_WIDTH,
+                               capstyle=tk.ROUND, joinstyle=tk.ROUND, tags=(tag, 'pista'))
+            canvas.create_line(coords, fill='black', width=GUIDE_WIDTH,
+                               capstyle=tk.ROUND, joinstyle=tk.ROUND, tags=(tag, 'guia'))
+        for i, x, y in self.stations.get((tx, ty), []):
+            canvas.create_oval(x-15, y-15, x+15, y+15, fill='#F1C40F', outline='#B7950B', width=3,
+                               tags=(tag, 'marcas'))
+            canvas.create_text(x, y, text=f"S{i}", font=("Arial",12,"bold"), tags=(tag, 'marcas'))
+        for b in self.tiles.bars.get((tx, ty), []):
+            canvas.create_rectangle(*self.track.stop_bars[b], fill='black', outline='red',
+                                    width=STOP_BAR_OUTLINE, tags=(tag, 'marcas'))
+
+class Trail:
+    # Estela de capacidad fija: un deque con maxlen descarta solo el punto más viejo,
+    # y se dibuja como una sola polilínea que se reutiliza en cada actualización
+    def __init__(self, canvas, capacity=TRAIL_CAPACITY, every=TRAIL_EVERY):
+        self.canvas = canvas
+        self.points = deque(maxlen=capacity)
+        self.every = every
+        self.line = canvas.create_line(0, 0, 0, 0, fill='#F39C12', width=2, state=tk.HIDDEN)
+
+    def add(self, step, x, y):
+        if step % self.every:
+            return
+        self.points.append((x, y))
+        if len(self.points) >= 2:
+            self.canvas.coords(self.line, *[c for pt in self.points for c in pt])
+            self.canvas.itemconfigure(self.line, state=tk.NORMAL)
+
+class CarView:
+    # Dibuja un LineFollowerCar; solo lee su estado, nunca lo modifica
+    def __init__(self, canvas, car):
+        self.canvas = canvas
+        self.car = car
+        self.trail = Trail(canvas)
+        self.stop_label = None
+
+        # Dibujar cuerpo, ruedas y sensores
+        self.body = self.create_car_body()
+        self.left_wheel = self.create_wheel()
+        self.right_wheel = self.create_wheel()
+        self.sensor_left = self.create_sensor()
+        self.sensor_right = self.create_sensor()
+        self.update_car()
+
+    def create_car_body(self):
+        return self.canvas.create_polygon([0,0,50,0,50,30,0,30], fill='#2E86C1', outline='#1B4F72', width=2)
+    def create_wheel(self):
+        return self.canvas.create_oval(0,0,12,12, fill='#2C3E50', outline='#1B2631')
+    def create_sensor(self):
+        return self.canvas.create_oval(0,0,10,10, fill='#E74C3C', outline='#922B21', width=2)
+
+    def update_car(self):
+        car = self.car
+        x, y = car.car_x, car.car_y
+        cos_a, sin_a = car.cos_a, car.sin_a
+        # Body coords
+        coords = [
+            x + 15*cos_a - 10*sin_a, y + 15*sin_a + 10*cos_a,
+            x + 15*cos_a + 10*sin_a, y + 15*sin_a - 10*cos_a,
+            x - 15*cos_a + 10*sin_a, y - 15*sin_a - 10*cos_a,
+            x - 15*cos_a - 10*sin_a, y - 15*sin_a + 10*cos_a
+        ]
+        self.canvas.coords(self.body, *coords)
+        # Wheels
+        self._update_wheel(self.left_wheel, -10)
+        self._update_wheel(self.right_wheel, 10)
+        # Sensors
+        sl, sr = car.get_sensor_positions()
+        self.canvas.coords(self.sensor_left, sl[0]-5, sl[1]-5, sl[0]+5, sl[1]+5)
+        self.canvas.coords(self.sensor_right, sr[0]-5, sr[1]-5, sr[0]+5, sr[1]+5)
+
+    def _update_wheel(self, wheel, offset):
+        car = self.car
+        x = car.car_x + offset * car.sin_a
+        y = car.car_y - offset * car.cos_a
+        self.canvas.coords(wheel, x-6, y-6, x+6, y+6)
+
+    def draw(self):
+        car = self.car
+        if car.stopping:
+            # Mostrar mensaje de parada una sola vez
+            if self.stop_label is None:
+                self.stop_label = self.canvas.create_text(car.car_x, car.car_y - 30,
+                                                          text="¡DETENIDO!",
+                                                          font=("Arial", 12, "bold"),
+                                                          fill="red")
+            return
+        self.update_car()
+        self.trail.add(car.steps, car.car_x, car.car_y)
+
+class FleetView:
+    # Solo se dibujan los carros de `shown`: el resto de la flota simula sin canvas
+    def __init__(self, canvas, fleet, shown):
+        self.canvas = canvas
+        self.fleet = fleet
+        self.shown = list(shown)
+        colors = ['#2E86C1', '#CB4335', '#28B463', '#AF7AC5', '#F5B041', '#5D6D7E']
+        self.bodies = [canvas.create_polygon(0, 0, 0, 0, 0, 0, fill=colors[k % len(colors)],
+                                             outline='#1B2631', width=1)
+                       for k in range(len(self.shown))]
+
+    def draw(self):
+        f = self.fleet
+        for body, i in zip(self.bodies, self.shown):
+            x, y, c, s = f.x[i], f.y[i], f.cos_a[i], f.sin_a[i]
+            self.canvas.coords(body,
+                               x + 15*c - 10*s, y + 15*s + 10*c, x + 15*c + 10*s, y + 15*s - 10*c,
+                               x - 15*c + 10*s, y - 15*s - 10*c, x - 15*c - 10*s, y - 15*s + 10*c)
+
+# ===================== TELEMETRÍA ========================
+# Un registro de tamaño fijo por tick en un búfer circular preasignado. Cada
+# `batch` registros nuevos se escriben de una vez al log: binario (cabecera +
+# registros empaquetados) o CSV si el archivo termina en .csv. El búfer guarda
+# los últimos `capacity` ticks para el resumen.
+
+TELEMETRY_MAGIC = b'CTEL'
+TELEMETRY_VERSION = 1
+TELEMETRY_HEADER = struct.Struct('<4sHH')  # magia, versión, bytes por registro
+TELEMETRY_RECORD = struct.Struct('<IffffBffI')
+TELEMETRY_FIELDS = ('tick', 'sim_time', 'interval_ms', 'step_ms', 'draw_ms', 'state',
+                    'steering', 'integral', 'items')
+STATES = ('none', 'left', 'right', 'center', 'both', 'stopped')
+STATE_CODES = {name: code for code, name in enumerate(STATES)}
+
+class Telemetry:
+    def __init__(self, path=None, capacity=4096, batch=256, period_ms=DT * 1000):
+        self.capacity = capacity
+        self.batch = min(batch, capacity)  # nunca se pisa un registro sin escribir
+        self.period_ms = period_ms
+        self.buf = bytearray(capacity * TELEMETRY_RECORD.size)
+        self.count = 0
+        self.flushed = 0
+        self.transitions = Counter()
+        self.prev_state = None
+        self.file = self.writer = None
+        if path:
+            if path.endswith('.csv'):
+                self.file = open(path, 'w', newline='')
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(TELEMETRY_FIELDS)
+            else:
+                self.file = open(path, 'wb')
+                self.file.write(TELEMETRY_HEADER.pack(TELEMETRY_MAGIC, TELEMETRY_VERSION,
+                                                      TELEMETRY_RECORD.size))
+
+    def record(self, car, interval_ms=0.0, step_ms=0.0, draw_ms=0.0, items=0):
+        state = car.state
+        if self.prev_state is not None and state != self.prev_state:
+            self.transitions[f"{self.prev_state}→{state}"] += 1
+        self.prev_state = state
+        TELEMETRY_RECORD.pack_into(self.buf, (self.count % self.capacity) * TELEMETRY_RECORD.size,
+                                   self.count, car.sim_time, interval_ms, step_ms, draw_ms,
+                                   STATE_CODES[state], car.steering, car.pid.integral, items)
+        self.count += 1
+        if self.file and self.count - self.flushed >= self.batch:
+            self.flush()
+
+    def _slice(self, first, last):
+        # Bytes de los registros [first, last) del búfer circular, en orden
+        size = TELEMETRY_RECORD.size
+        a, b = first % self.capacity, last % self.capacity
+        if a < b or last == first:
+            return bytes(self.buf[a * size:b * size])
+        return bytes(self.buf[a * size:]) + bytes(self.buf[:b * size])
+
+    def flush(self):
+        if not self.file or self.flushed == self.count:
+            return
+        data = self._slice(self.flushed, self.count)
+        if self.writer:
+            self.writer.writerows(_csv_row(row) for row in TELEMETRY_RECORD.iter_unpack(data))
+        else:
+            self.file.write(data)
+        self.flushed = self.count
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def rows(self):
+        first = max(self.count - self.capacity, 0)
+        return list(TELEMETRY_RECORD.iter_unpack(self._slice(first, self.count)))
+
+    def summary_lines(self):
+        return telemetry_summary(self.rows(), self.period_ms, self.transitions)
+
+def _csv_row(row):
+    # Estado por nombre; los float32 del registro, sin los decimales espurios
+    return [STATES[v] if k == 5 else f'{v:.6g}' if isinstance(v, float) else v
+            for k, v in enumerate(row)]
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+def telemetry_summary(rows, period_ms=DT * 1000, transitions=None):
+    if transitions is None:
+        transitions = Counter()
+        for prev, row in zip(rows, rows[1:]):
+            if prev[5] != row[5]:
+                transitions[f"{STATES[prev[5]]}→{STATES[row[5]]}"] += 1
+    steps = [row[3] for row in rows]
+    draws = [row[4] for row in rows]
+    intervals = [row[2] for row in rows if row[2] > 0]
+    lines = [f"Últimos {len(rows)} ticks: paso p50 {_percentile(steps, 0.5):.3f} ms  "
+             f"p99 {_percentile(steps, 0.99):.3f} ms  dibujo p99 {_percentile(draws, 0.99):.3f} ms"]
+    if intervals:
+        # Jitter: cuánto se aparta el intervalo real entre ticks del período de after()
+        mean = sum(intervals) / len(intervals)
+        jitter = math.sqrt(sum((v - mean) ** 2 for v in intervals) / len(intervals))
+        lines.append(f"Intervalo medio {mean:.1f} ms (objetivo {period_ms:.0f})  jitter {jitter:.2f} ms  "
+                     f"retraso p99 {_percentile(intervals, 0.99) - period_ms:.1f} ms")
+    if rows and rows[-1][8]:
+        lines.append(f"Ítems en canvas al final: {rows[-1][8]}")
+    if transitions:
+        lines.append("Transiciones: " + ", ".join(f"{name} {n}" for name, n in transitions.most_common()))
+    return lines
+
+def read_telemetry(path):
+    # Registros de un log binario o CSV, como tuplas en el orden de TELEMETRY_FIELDS
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader)
+            return [(int(r[0]), float(r[1]), float(r[2]), float(r[3]), float(r[4]), STATE_CODES[r[5]],
+                     float(r[6]), float(r[7]), int(r[8])) for r in reader]
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, size = TELEMETRY_HEADER.unpack_from(data)
+    if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION or size != TELEMETRY_RECORD.size:
+        raise ValueError(f"{path} no es un log de telemetría compatible")
+    body = data[TELEMETRY_HEADER.size:]
+    return list(TELEMETRY_RECORD.iter_unpack(body[:len(body) - len(body) % size]))
+
+# ===================== VERIFICACIÓN ========================
+
+def check_masks(track, samples=4000, seed=0):
+    # Compara las capas de ocupación con find_overlapping de un canvas de Tk en
+    # píxeles al azar: la mitad cerca de la línea guía, una parte junto a las
+    # barras y el resto en cualquier lugar. Devuelve las diferencias como
+    # (x, y, esperado, obtenido), o None si no hay pantalla para abrir Tk.
+    try:
+        window = tk.Tk()
+    except tk.TclError:
+        return None
+    window.withdraw()
+    try:
+        w, h = track.size
+        canvas = tk.Canvas(window, width=w, height=h)
+        guide_line, stop_bars = draw_track(canvas, track)
+        rng = np.random.default_rng(seed)
+        near_line = track.polyline[rng.integers(len(track.polyline), size=samples // 2)]
+        near_line = near_line + rng.uniform(-20, 20, near_line.shape)
+        bars = np.array(track.stop_bars, float)[rng.integers(len(track.stop_bars), size=samples // 4)]
+        near_bar = np.column_stack([rng.uniform(bars[:, 0] - 15, bars[:, 2] + 15),
+                                    rng.uniform(bars[:, 1] - 15, bars[:, 3] + 15)])
+        anywhere = rng.uniform((0, 0), (w, h), (samples - len(near_line) - len(near_bar), 2))
+        points = np.rint(np.concatenate([near_line, near_bar, anywhere])).astype(int)
+
+        mismatches = []
+        for x, y in points.tolist():
+            found = canvas.find_overlapping(x-5, y-5, x+5, y+5)
+            expected = (guide_line in found, any(bar in found for bar in stop_bars))
+            got = (track.on_line(x, y), track.on_stop_bar(x, y))
+            if got != expected:
+                mismatches.append((x, y, expected, got))
+        return mismatches
+    finally:
+        window.destroy()
+
+# ===================== BUCLES ========================
+
+def open_track_view(canvas, track):
+    # Pista entera si cabe en la ventana; si no, mosaicos que siguen al carro
+    if track.fits():
+        guide_line, stop_bars = draw_track(canvas, track)
+        sensors = track if track.guide_mask is not None else CanvasSensors(canvas, guide_line, stop_bars)
+        return sensors, None
+    return track, TiledTrackView(canvas, track)
+
+def place_status(canvas, status, scroller, x, y):
+    # El texto de estado queda fijo en la esquina inferior izquierda de la vista
+    left, top = scroller.follow(x, y) if scroller else (0, 0)
+    canvas.coords(status, left + 10, top + CANVAS_SIZE[1] - 10)
+
+def run_window(track, telemetry_path=None):
+    window = tk.Tk()
+    window.title("Seguidor de Línea con Pista Extendida")
+    w, h = CANVAS_SIZE
+    canvas = tk.Canvas(window, width=w, height=h)
+    canvas.pack()
+
+    sensors, scroller = open_track_view(canvas, track)
+
+    # Inicializar carro
+    car = LineFollowerCar(sensors, start=track.start, size=track.size)
+    view = CarView(canvas, car)
+    if scroller is None:
+        canvas.create_text(400, 30, text="Seguidor de Línea - Pista Extendida", font=("Arial",14,"bold"))
+    status = canvas.create_text(10, h - 10, anchor=tk.SW, font=("Arial", 9), fill='#1B2631')
+
+    telemetry = Telemetry(telemetry_path)
+    ticks = 0
+    items = 0
+    last = None
+
+    # Loop: un paso de simulación por cada tick de 30 ms
+    def game_loop():
+        nonlocal ticks, items, last
+        start = time.perf_counter()
+        car.step()
+        middle = time.perf_counter()
+        view.draw()
+        place_status(canvas, status, scroller, car.car_x, car.car_y)
+        end = time.perf_counter()
+        ticks += 1
+        if ticks % 33 == 1:  # cerca de una vez por segundo
+            items = sum(item_counts(canvas).values())
+            canvas.itemconfigure(status, text=f"Ítems en canvas: {items}  t = {car.sim_time:.1f} s")
+        # Intervalo: cuánto pasó desde el tick anterior (30 ms más lo que after() se atrase)
+        interval = (start - last) * 1000 if last is not None else 0.0
+        last = start
+        telemetry.record(car, interval, (middle - start) * 1000, (end - middle) * 1000, items)
+        window.after(int(car.dt * 1000), game_loop)
+
+    def on_close():
+        telemetry.close()
+        for line in telemetry.summary_lines():
+            print(line)
+        window.destroy()
+
+    window.protocol("WM_DELETE_WINDOW", on_close)
+    game_loop()
+    window.mainloop()
+
+def run_fleet_window(track, n, show, seed=0):
+    window = tk.Tk()
+    window.title(f"Seguidor de Línea - flota de {n} carros")
+    w, h = CANVAS_SIZE
+    canvas = tk.Canvas(window, width=w, height=h)
+    canvas.pack()
+
+    _, scroller = open_track_view(canvas, track)
+    fleet = Fleet(track, random_variants(n, seed))
+    view = FleetView(canvas, fleet, range(min(show, n)))
+    status = canvas.create_text(10, h - 10, anchor=tk.SW, font=("Arial", 9), fill='#1B2631')
+
+    def game_loop():
+        fleet.step()
+        view.draw()
+        # En pistas grandes la vista sigue al primer carro
+        place_status(canvas, status, scroller, fleet.x[0], fleet.y[0])
+        done = int(((fleet.laps >= 1) | fleet.stopping).sum())
+        canvas.itemconfigure(status, text=f"{n} carros, {len(view.shown)} dibujados, "
+                                          f"{done} con la vuelta completa")
+        window.after(int(fleet.dt * 1000), game_loop)
+
+    game_loop()
+    window.mainloop()
+
+def run_fleet_headless(track, n, seed=0, max_time=600.0, laps=1):
+    fleet = Fleet(track, random_variants(n, seed))
+    start = time.perf_counter()
+    fleet.run(max_time, laps)
+    elapsed = time.perf_counter() - start
+    steps = int(round(fleet.sim_time.max() / fleet.dt))
+    finished = ~np.isnan(fleet.lap_time)
+    print(f"{n} carros, {steps} pasos en {elapsed * 1000:.0f} ms de reloj "
+          f"({n * steps / max(elapsed, 1e-9):.0f} pasos de carro/s)")
+    print(f"Vuelta completa: {int(finished.sum())}/{n}, detenidos en la barra: {int(fleet.stopping.sum())}")
+    if finished.any():
+        best = int(np.nanargmin(fleet.lap_time))
+        print(f"Vuelta más rápida: {fleet.lap_time[best]:.2f} s con {json.dumps(fleet.variants[best])}")
+    print_tile_stats(track)
+    return fleet
+
+def print_tile_stats(track):
+    tiles = track.tiles
+    print(f"Mosaicos: {tiles.built} armados, {tiles.loaded} leídos de disco, {len(tiles.open)} abiertos "
+          f"de {tiles.cols * tiles.rows} en un mundo de {track.size[0]}x{track.size[1]} px")
+
+def run_headless(track, max_time, laps=1, telemetry_path=None):
+    if track.fits():
+        track.tiles.build_all()  # se arman (o se leen de disco) antes de medir
+    car = LineFollowerCar(track, start=track.start, size=track.size)
+    start = time.perf_counter()
+    max_steps = int(max_time / car.dt)
+    total_dev = max_dev = 0.0
+    off_track = 0
+    telemetry = Telemetry(telemetry_path) if telemetry_path else None
+    while car.steps < max_steps:
+        step_start = time.perf_counter()
+        moving = car.step()
+        if telemetry:
+            telemetry.record(car, step_ms=(time.perf_counter() - step_start) * 1000)
+        if not moving:
+            break
+        dev = abs(car.cross_track)
+        total_dev += dev
+        max_dev = max(max_dev, dev)
+        off_track += dev > TRACK_WIDTH / 2
+        if car.laps >= laps:
+            break
+    stopped = car.stopping
+    elapsed = time.perf_counter() - start
+    if stopped:
+        result = "detenido en la barra"
+    elif car.laps >= laps:
+        result = f"{car.laps} vuelta(s) completa(s)"
+    else:
+        result = "tiempo agotado"
+    print(f"{result}: {car.sim_time:.2f} s simulados, {car.steps} pasos "
+          f"en {elapsed * 1000:.1f} ms de reloj")
+    progress = track.progress(car.car_x, car.car_y)
+    print(f"Desvío de la línea: medio {total_dev / max(car.steps, 1):.1f} px, máximo {max_dev:.1f} px, "
+          f"{off_track} pasos fuera de pista; posición final {progress:.0f}/{track.length:.0f} px de la vuelta")
+    print_tile_stats(track)
+    if telemetry:
+        telemetry.close()
+        for line in telemetry.summary_lines():
+            print(line)
+    return car
+
+def main():
+    parser = argparse.ArgumentParser(description="Seguidor de línea con pista extendida")
+    parser.add_argument('--headless', action='store_true',
+                        help="simular sin ventana, a paso fijo y sin esperar al reloj")
+    parser.add_argument('--laps', type=int, default=1, help="vueltas a simular en modo headless")
+    parser.add_argument('--fleet', type=int, default=0, metavar='N',
+                        help="simular N variantes del carro a la vez con NumPy")
+    parser.add_argument('--show', type=int, default=10, help="con --fleet: carros que se dibujan")
+    parser.add_argument('--seed', type=int, default=0, help="con --fleet: semilla de las variantes")
+    parser.add_argument('--telemetry', metavar='ARCHIVO',
+                        help="guardar la telemetría por tick (binaria, o CSV si termina en .csv)")
+    parser.add_argument('--report', metavar='ARCHIVO', help="resumir un log de telemetría y salir")
+    parser.add_argument('--max-time', type=float, default=600.0,
+                        help="segundos simulados como máximo en modo headless")
+    parser.add_argument('--track', metavar='ARCHIVO', help="cargar la pista de un archivo JSON")
+    parser.add_argument('--warehouse', metavar='FILASxCOLUMNAS',
+                        help="generar un almacén de prueba con esa rejilla de estaciones")
+    parser.add_argument('--save-track', metavar='ARCHIVO', help="guardar la pista elegida y salir")
+    parser.add_argument('--check-masks', action='store_true',
+                        help="comparar las máscaras de la pista con find_overlapping de Tk y salir")
+    args = parser.parse_args()
+    if args.report:
+        for line in telemetry_summary(read_telemetry(args.report)):
+            print(line)
+        return
+
+    if args.track and args.warehouse:
+        parser.error("--track y --warehouse no se pueden usar juntos")
+    if args.track:
+        try:
+            track = load_track(args.track)
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"no se pudo cargar la pista: {e}")
+    elif args.warehouse:
+        rows, _, cols = args.warehouse.partition('x')
+        if not (rows.isdigit() and cols.isdigit() and int(rows) > 0 and int(cols) > 0):
+            parser.error(f"rejilla inválida: {args.warehouse}")
+        track = warehouse_track(int(rows), int(cols))
+    else:
+        track = Track()
+    if args.save_track:
+        save_track(track, args.save_track)
+        print(f"Pista guardada en {args.save_track}: {len(track.stops)} estaciones, "
+              f"{track.size[0]}x{track.size[1]} px")
+        return
+    if args.check_masks:
+        if np is None:
+            parser.error("la verificación necesita NumPy para las máscaras de la pista")
+        mismatches = check_masks(track)
+        if mismatches is None:
+            print("Sin pantalla para abrir Tk: verificación omitida")
+            return
+        for x, y, expected, got in mismatches[:10]:
+            print(f"❌ ({x}, {y}): canvas (línea, barra) = {expected}, máscaras = {got}")
+        if mismatches:
+            raise SystemExit(f"{len(mismatches)} píxeles no coinciden con find_overlapping")
+        print("✅ Las máscaras coinciden con find_overlapping en todos los píxeles probados")
+        return
+
+    if (args.headless or args.fleet) and np is None:
+        parser.error("el modo headless y la flota necesitan NumPy para las máscaras de la pista")
+    if not track.fits() and np is None:
+        parser.error("las pistas más grandes que la ventana necesitan NumPy para los mosaicos")
+    if args.fleet and args.headless:
+        run_fleet_headless(track, args.fleet, args.seed, args.max_time, args.laps)
+    elif args.fleet:
+        run_fleet_window(track, args.fleet, args.show, args.seed)
+    elif args.headless:
+        run_headless(track, args.max_time, args.laps, args.telemetry)
+    else:
+        run_window(track, args.telemetry)
 
-# Fondo y decoración
-canvas.create_rectangle(0,0,800,600, fill='#7DCEA0', stipple='gray25')
-
-# Pista base y línea guía
-track = canvas.create_line(
-    create_track_path(stops), fill='#566573', width=30,
-    smooth=True, capstyle=tk.ROUND
-)
-guide_line = canvas.create_line(
-    create_track_path(stops), fill='black', width=15,
-    smooth=True, joinstyle=tk.ROUND, capstyle=tk.ROUND
-)
-
-# Dibujar estaciones
-for i, (x,y) in enumerate(stops, start=1):
-    canvas.create_oval(x-15, y-15, x+15, y+15,
-                       fill='#F1C40F', outline='#B7950B', width=3)
-    canvas.create_text(x, y, text=f"S{i}", font=("Arial",12,"bold"))
-
-# Crear barra de parada en el punto final (primer punto)
-s_end_x, s_end_y = stops[0]  # Posición de parada final
-stop_bar = canvas.create_rectangle(s_end_x-40, s_end_y-5, s_end_x+40, s_end_y+5, 
-                                 fill='black', outline='red', width=2)
-
-# Inicializar carro
-car = LineFollowerCar(canvas)
-canvas.create_text(400, 30, text="Seguidor de Línea - Pista Extendida", font=("Arial",14,"bold"))
-
-# Loop
-def game_loop():
-    car.move()
-    if random.random()>0.5 and not car.stopping:
-        canvas.create_oval(car.car_x-1, car.car_y-1,
-                           car.car_x+1, car.car_y+1,
-                           fill='#F39C12', outline='')
-    window.after(30, game_loop)
-
-game_loop()
-window.mainloop()
+if __name__ == '__main__':
+    main()